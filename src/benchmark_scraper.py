@@ -0,0 +1,120 @@
+"""Benchmark the comment tree scraper against a local Reddit API fixture.
+
+Each case scrapes and dumps one synthetic thread in a fresh process,
+and reports wall time, requests, peak memory, and bytes written.
+Cases are run without, then with, a memory limit on the comment data."""
+
+import time
+import pathlib
+import tempfile
+import multiprocessing
+from database import DatabaseWriting
+from reddit_fixture import FixtureServer, generate_thread
+from scraper_comment_tree import CommentTreeScraper
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Case name: (thread shape, number of comments)
+CASES = {
+    "wide": ("wide", 5000),
+    "deep": ("deep", 5000),
+    "megathread": ("megathread", 50000),
+}
+# MB of comment data kept in memory when limited
+MEMORY_LIMIT = 4
+
+
+def peak_rss() -> float:
+    """Return the peak resident memory of the process in MB, if available."""
+    if resource is None:
+        return None
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_case(
+    settings: dict,
+    submission_id: str,
+    results: multiprocessing.Queue,
+    memory_limit: int = None,
+) -> None:
+    """Scrape and dump the given submission, then report the measurements."""
+    with tempfile.TemporaryDirectory() as path:
+        db = DatabaseWriting(path=":memory:")
+        db.setup_tables()
+        db.q.execute(
+            "INSERT INTO writing (post_id, title) VALUES (?, ?)",
+            (submission_id, submission_id),
+        )
+        scraper = CommentTreeScraper(
+            config_name=None, db=db, memory_limit=memory_limit, **settings
+        )
+        start = time.perf_counter()
+        scraper.select_submission(submission_id)
+        scraper.dump_all(path=path, json_lines=True)
+        elapsed = time.perf_counter() - start
+        written = sum(
+            file.stat().st_size
+            for file in pathlib.Path(path).rglob("*")
+            if file.is_file()
+        )
+    results.put(
+        {
+            "comments": len(scraper.extract_comments()),
+            "time": elapsed,
+            "peak_rss": peak_rss(),
+            "bytes": written,
+        }
+    )
+
+
+def benchmark(
+    cases: dict[str, tuple[str, int]], memory_limit: int = None
+) -> dict[str, dict]:
+    """Run the given cases and return their measurements."""
+    server = FixtureServer(
+        [generate_thread(name, shape, size) for name, (shape, size) in cases.items()]
+    )
+    server.start()
+    context = multiprocessing.get_context("spawn")
+    measurements = {}
+    try:
+        for name in cases:
+            print(f"Running case: {name}")
+            server.reset_count()
+            results = context.Queue()
+            process = context.Process(
+                target=run_case, args=(server.settings, name, results, memory_limit)
+            )
+            process.start()
+            measurements[name] = results.get()
+            process.join()
+            measurements[name]["requests"] = dict(server.requests)
+    finally:
+        server.stop()
+    return measurements
+
+
+def report(measurements: dict[str, dict]) -> str:
+    """Format the measurements as a table."""
+    lines = [
+        f"{'case':<12}{'comments':>10}{'time (s)':>10}{'requests':>10}"
+        f"{'peak RSS (MB)':>15}{'written (KB)':>14}  requests by endpoint"
+    ]
+    for name, data in measurements.items():
+        rss = f"{data['peak_rss']:.1f}" if data["peak_rss"] is not None else "n/a"
+        lines.append(
+            f"{name:<12}{data['comments']:>10}{data['time']:>10.2f}"
+            f"{sum(data['requests'].values()):>10}{rss:>15}"
+            f"{data['bytes'] / 1024:>14.1f}  {data['requests']}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(report(benchmark(CASES)))
+    print(f"With a memory limit of {MEMORY_LIMIT} MB:")
+    print(report(benchmark(CASES, memory_limit=MEMORY_LIMIT)))
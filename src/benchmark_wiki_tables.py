@@ -0,0 +1,291 @@
+"""Benchmark the wiki table tokenizer against the regexes it replaced.
+
+Every table of the discussion and rewatch wiki pages is parsed with each table
+format, with the previous regex based parsers and the current ones in turn.
+The tables parsed differently are counted, and a few of them shown,
+to review how the results changed."""
+
+import re
+import glob
+import time
+from operator import ior
+from functools import reduce
+from typing import Any, Callable
+from parser_wiki import TableParser, Parser, read_lines
+from parser_wiki_discussion import TableDiscussionParser
+from parser_wiki_discussion import FILE_PATH as DISCUSSION_PATH
+from parser_wiki_rewatch import FILE_PATH as REWATCH_PATH
+
+TABLE_LINK_AND_TEXT = re.compile(r"\[([^\|]*)\]\(\/(?:comments\/)?([^\|]+)\)")
+TABLE_LINK = re.compile(r"\[[^\|]*\]\(\/(?:comments\/)?([^\|]+)\)")
+PERMALINK_AND_TEXT = re.compile(
+    r"(?:\|([^\|]*)\|\[[^\]]*\]\(https?:\/\/redd\.it\/(\w+)(?:\)|$)"
+    r"|\[([^\]]*)\]\([^\s]*comments\/(\w+)[^\)]*(?:\)|$)"
+    r"|\[([^\]]*)\]\(\/(\w+)(?:\)|$))"
+)
+CONTENTS_LINKS = re.compile(
+    r"\[[^\]]+\]\([^|]*(?:comments|redd\.it)?\/(\w+)[^\)]*(?:\)|$)"
+)
+LONG_RUNNING_PARSE = re.compile(r"\[([^\]]+)\]\([^\)]*\/(\w+)\/?\)")
+
+# Number of runs of each format, the fastest one is reported
+REPEAT = 20
+# Differing tables shown per format
+SHOWN = 3
+
+
+class RegexTableParser:
+    """The regex based table parsers, as they were before the tokenizer."""
+
+    @staticmethod
+    def parse_table_no_headers(table: list[str]) -> dict:
+        """Parse a rewatch table that has no headers."""
+        return reduce(
+            ior,
+            list(
+                dict(pair)
+                for row in table
+                if (pair := TABLE_LINK_AND_TEXT.findall(row))
+            ),
+        )
+
+    @staticmethod
+    def parse_table_alternate_headers(table: list[str]) -> dict:
+        """Parse a rewatch table that alternates headers and contents."""
+        data = {}
+        for header, contents in zip(table[::2], table[1::2]):
+            titles = list(filter(None, header.split("|")))
+            links = [TABLE_LINK.search(field) for field in contents.split("|") if field]
+            data.update(dict(zip(titles, [x[1] if x else None for x in links])))
+        return data
+
+    @staticmethod
+    def parse_table_one_header_alternate_contents(table: list[str]) -> dict:
+        """Parse a rewatch table with a single header, and alternating name/link."""
+        data = {}
+        for row in table[1:]:
+            row = list(filter(None, row.split("|")))
+            for title, link in zip(row[::2], row[1::2]):
+                link = TABLE_LINK.findall(link)
+                data[title] = link[0] if link else None
+        return data
+
+    @staticmethod
+    def parse_table_one_header_contents_right(table: list[str]) -> dict:
+        """Parse a rewatch table with a single header, and link on the right."""
+        data = {}
+        for row in table[1:]:
+            row = list(filter(None, row.split("|")))
+            titles, link = row[:-1], row[-1]
+            title = " - ".join(title for title in titles)
+            link = TABLE_LINK.findall(link)
+            data[title] = link[0] if link else None
+        return data
+
+    @staticmethod
+    def parse_table_one_header_contents_left(table: list[str]) -> dict:
+        """Parse a rewatch table with a single header, and link on the left."""
+        true_table = [row.split("|")[0] for row in table[1:]]
+        return RegexTableParser.parse_table_no_headers(true_table)
+
+    @staticmethod
+    def parse_discussion_one_header(table: list[str]) -> dict:
+        """Parse a discussion table that has a single header row."""
+        return reduce(
+            ior,
+            list(
+                {
+                    entry[1]: entry[0]
+                    for entry in PERMALINK_AND_TEXT.findall(row)
+                    if entry[1]
+                }
+                for row in table[1:]
+            ),
+        )
+
+    @staticmethod
+    def parse_discussion_alternate_headers(table: list[str]) -> dict:
+        """Parse a discussion table that alternate headers and contents."""
+        ans = {}
+        for pair in zip(table[::2], table[1::2]):
+            header_row, link_row = pair
+            for title, contents in zip(header_row.split("|"), link_row.split("|")):
+                links = CONTENTS_LINKS.findall(contents)
+                if links and links[0]:
+                    ans[links[0]] = title
+        return ans
+
+    @staticmethod
+    def parse_discussion_no_headers(table: list[str]) -> dict:
+        """Parse a discussion table that has no header."""
+        return reduce(
+            ior,
+            list(
+                {
+                    entry[1]: entry[0]
+                    for entry in LONG_RUNNING_PARSE.findall(row)
+                    if entry[1]
+                }
+                for row in table
+            ),
+        )
+
+    @staticmethod
+    def permalinks(table: list[str]) -> list[tuple[str, str]]:
+        """Return the title and post id of the links in each row."""
+        ans = []
+        for row in table:
+            for pair in PERMALINK_AND_TEXT.findall(row):
+                title, post_id = (x for x in pair if x)
+                ans.append((title, post_id))
+        return ans
+
+    @staticmethod
+    def remove_formatting(table: list[str]) -> list[str]:
+        """Remove the formatting of every cell."""
+        ans = []
+        for row in table:
+            for cell in row.split("|"):
+                text = cell.strip()
+                while text.count("*") > 1:
+                    text = text.replace("*", "", 2)
+                while text.startswith("#"):
+                    text = text[1:]
+                ans.append(text.strip())
+        return ans
+
+
+def permalinks(table: list[str]) -> list[tuple[str, str]]:
+    """Return the title and post id of the links in each row."""
+    return [pair for row in table for pair in TableDiscussionParser.permalinks(row)]
+
+
+def remove_formatting(table: list[str]) -> list[str]:
+    """Remove the formatting of every cell."""
+    return [Parser.remove_formatting(cell) for row in table for cell in row.split("|")]
+
+
+# Format: (regex parser, tokenizer parser)
+FORMATS: dict[str, tuple[Callable, Callable]] = {
+    "rewatch no headers": (
+        RegexTableParser.parse_table_no_headers,
+        TableParser.parse_table_no_headers,
+    ),
+    "rewatch alternate headers": (
+        RegexTableParser.parse_table_alternate_headers,
+        TableParser.parse_table_alternate_headers,
+    ),
+    "rewatch alternate contents": (
+        RegexTableParser.parse_table_one_header_alternate_contents,
+        TableParser.parse_table_one_header_alternate_contents,
+    ),
+    "rewatch contents right": (
+        RegexTableParser.parse_table_one_header_contents_right,
+        TableParser.parse_table_one_header_contents_right,
+    ),
+    "rewatch contents left": (
+        RegexTableParser.parse_table_one_header_contents_left,
+        TableParser.parse_table_one_header_contents_left,
+    ),
+    "discussion one header": (
+        RegexTableParser.parse_discussion_one_header,
+        TableDiscussionParser.parse_table_one_header,
+    ),
+    "discussion alternate headers": (
+        RegexTableParser.parse_discussion_alternate_headers,
+        TableDiscussionParser.parse_table_alternate_headers,
+    ),
+    "discussion no headers": (
+        RegexTableParser.parse_discussion_no_headers,
+        TableDiscussionParser.parse_table_no_headers,
+    ),
+    "permalinks": (RegexTableParser.permalinks, permalinks),
+    "remove formatting": (RegexTableParser.remove_formatting, remove_formatting),
+}
+
+
+def read_tables(file_path: str) -> list[list[str]]:
+    """Return the markdown tables of a wiki page, as read by the parsers."""
+    tables = []
+    table = []
+    for line in read_lines(file_path):
+        if line.count("|") >= 1:
+            if not set(line).issubset({"|", ":", "-"}):
+                table.append(line)
+        elif table:
+            tables.append(table)
+            table = []
+    if table:
+        tables.append(table)
+    return tables
+
+
+def parse_all(parse: Callable, tables: list[list[str]]) -> tuple[float, list[Any]]:
+    """Parse every table, and return the time taken and the results.
+
+    Tables that cannot be parsed have the name of the exception as result."""
+    results = []
+    start = time.perf_counter()
+    for table in tables:
+        try:
+            results.append(parse(table))
+        except Exception as e:
+            results.append(type(e).__name__)
+    return time.perf_counter() - start, results
+
+
+def benchmark(file_paths: list[str], repeat: int = REPEAT) -> dict[str, dict]:
+    """Parse the tables of the given pages with each format, both ways."""
+    tables = [table for file_path in file_paths for table in read_tables(file_path)]
+    print(f"{len(tables)} tables found in {len(file_paths)} pages")
+    measurements = {}
+    for name, (regex_parse, token_parse) in FORMATS.items():
+        # Alternate both ways, so that both see the same load on the machine
+        regex_runs, token_runs = zip(
+            *(
+                (parse_all(regex_parse, tables), parse_all(token_parse, tables))
+                for _ in range(repeat)
+            )
+        )
+        regex_time, regex_results = min(regex_runs)
+        token_time, token_results = min(token_runs)
+        measurements[name] = {
+            "regex": regex_time,
+            "tokenizer": token_time,
+            "differences": [
+                (table, before, after)
+                for table, before, after in zip(tables, regex_results, token_results)
+                if before != after
+            ],
+        }
+    return measurements
+
+
+def report(measurements: dict[str, dict], shown: int = SHOWN) -> str:
+    """Format the measurements as a table, followed by some of the differences."""
+    lines = [
+        f"{'format':<30}{'regex (ms)':>12}{'tokenizer (ms)':>16}"
+        f"{'speedup':>9}{'differing tables':>18}"
+    ]
+    for name, data in measurements.items():
+        speedup = data["regex"] / data["tokenizer"] if data["tokenizer"] else 0
+        lines.append(
+            f"{name:<30}{data['regex'] * 1000:>12.2f}{data['tokenizer'] * 1000:>16.2f}"
+            f"{speedup:>8.1f}x{len(data['differences']):>18}"
+        )
+    for name, data in measurements.items():
+        for table, before, after in data["differences"][:shown]:
+            lines.append(f"\n{name}:\n" + "\n".join(table[:5]))
+            lines.append(f"regex: {before}\ntokenizer: {after}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(
+        report(
+            benchmark(
+                sorted(glob.glob(f"{DISCUSSION_PATH}\\*.md"))
+                + sorted(glob.glob(f"{REWATCH_PATH}\\*.md"))
+            )
+        )
+    )
@@ -0,0 +1,83 @@
+"""Save and resume the expansion of comment trees."""
+
+import os
+import json
+import pathlib
+from typing import Iterator
+
+CHECKPOINT_FOLDER = "checkpoint"
+
+
+class ExpansionCheckpoint:
+    """The progress of the expansion of a submission comment tree.
+
+    Resolved comments are appended to a JSON Lines file as soon as they are found.
+    The frontier of unresolved ``MoreComments`` is rewritten from time to time.
+    Comments found again after resuming are appended again, and the last copy wins."""
+
+    def __init__(self, path: str, submission_id: str) -> None:
+        """Initialise the checkpoint of the given submission in the given path."""
+        self._comments_path: pathlib.PurePath = pathlib.Path(
+            f"{path}\\{CHECKPOINT_FOLDER}\\{submission_id}.jsonl"
+        )
+        self._frontier_path: pathlib.PurePath = pathlib.Path(
+            f"{path}\\{CHECKPOINT_FOLDER}\\{submission_id}.frontier.json"
+        )
+        self._comments_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = None
+
+    @property
+    def exists(self) -> bool:
+        """Return whether there is a saved frontier to resume from."""
+        return self._frontier_path.is_file()
+
+    def read_comments(self) -> Iterator[dict]:
+        """Yield the resolved comments, in the order they were found.
+
+        A line left incomplete by an interruption is discarded,
+        and removed from the file once all comments are read."""
+        if not self._comments_path.is_file():
+            return
+        valid_size = 0
+        with self._comments_path.open("rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                yield json.loads(line)
+                valid_size += len(line)
+        os.truncate(self._comments_path, valid_size)
+
+    def load_frontier(self) -> list[dict]:
+        """Return the data of the unresolved ``MoreComments``."""
+        with self._frontier_path.open(encoding="utf8") as f:
+            return json.load(f)
+
+    def add_comments(self, records: list[dict]) -> None:
+        """Append resolved comments."""
+        if not records:
+            return
+        if self._file is None:
+            self._file = self._comments_path.open("a", encoding="utf8")
+        self._file.write(
+            "".join(f"{json.dumps(record, default=str)}\n" for record in records)
+        )
+        self._file.flush()
+
+    def save_frontier(self, frontier: list[dict]) -> None:
+        """Replace the saved frontier with the given one."""
+        temp_path = self._frontier_path.with_suffix(".tmp")
+        with temp_path.open("w", encoding="utf8") as f:
+            f.write(json.dumps(frontier))
+        os.replace(temp_path, self._frontier_path)
+
+    def clear(self) -> None:
+        """Delete the checkpoint files."""
+        self.close()
+        self._comments_path.unlink(missing_ok=True)
+        self._frontier_path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        """Close the comment file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
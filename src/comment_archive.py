@@ -0,0 +1,93 @@
+"""Compressed archive of the raw data of a submission and its comments.
+
+An archive is a gzip-compressed JSON Lines file, or record of a pack.
+The first line is a header, followed by one line for the submission
+and one line per comment, each holding the raw data returned by the Reddit API.
+Reading an archive does not require PRAW."""
+
+import gzip
+import json
+import zlib
+import pathlib
+from typing import BinaryIO, Iterator
+
+ARCHIVE_FORMAT = "comment_archive"
+ARCHIVE_VERSION = 1
+ARCHIVE_EXTENSION = ".jsonl.gz"
+COMPRESSION_LEVEL = 6
+
+SUBMISSION = "submission"
+COMMENT = "comment"
+
+
+class ArchiveWriter:
+    """Write an archive one record at a time."""
+
+    def __init__(self, file: pathlib.PurePath | BinaryIO) -> None:
+        """Open the archive at the given path, overwriting it if it exists.
+
+        A binary file can be given instead, and is left open when closing."""
+        self._file = gzip.open(
+            file, "wt", encoding="utf8", compresslevel=COMPRESSION_LEVEL
+        )
+        self._write({"format": ARCHIVE_FORMAT, "version": ARCHIVE_VERSION})
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record, default=str))
+        self._file.write("\n")
+
+    def write_submission(self, data: dict) -> None:
+        """Write the submission data."""
+        self._write({"kind": SUBMISSION, "data": data})
+
+    def write_comment(self, data: dict) -> None:
+        """Write the data of a comment."""
+        self._write({"kind": COMMENT, "data": data})
+
+    def close(self) -> None:
+        """Close the archive."""
+        self._file.close()
+
+
+def read_archive(file: str | BinaryIO) -> Iterator[tuple[str, dict]]:
+    """Yield the kind and data of each record in the archive, at a path or in a file."""
+    with gzip.open(file, "rt", encoding="utf8") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != ARCHIVE_FORMAT:
+            raise ValueError(f"{file} is not a comment archive")
+        if header["version"] > ARCHIVE_VERSION:
+            raise ValueError(
+                f"{file} has unsupported archive version {header['version']}"
+            )
+        for line in f:
+            record = json.loads(line)
+            yield record["kind"], record["data"]
+
+
+def load_archive(file: str | BinaryIO) -> tuple[dict, dict[str, dict]]:
+    """Return the submission data and the data of all comments, indexed by id."""
+    submission = None
+    comments = {}
+    for kind, data in read_archive(file):
+        if kind == SUBMISSION:
+            submission = data
+        elif kind == COMMENT:
+            comments[data["id"]] = data
+    return submission, comments
+
+
+def is_valid_archive(file: str | BinaryIO) -> bool:
+    """Return whether the file is a complete archive with a submission.
+
+    The whole file is read, so that truncated archives fail the gzip checks."""
+    try:
+        kinds = {kind for kind, _ in read_archive(file)}
+        return SUBMISSION in kinds
+    except (OSError, EOFError, zlib.error, ValueError):
+        return False
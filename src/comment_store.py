@@ -0,0 +1,84 @@
+"""Storage of the raw comment data of a submission, within a memory limit."""
+
+import json
+import tempfile
+from typing import Iterable, Iterator
+
+
+class CommentStore:
+    """The raw data of the comments of a submission, indexed by id.
+
+    Comments are kept in memory until their total JSON size reaches
+    ``memory_limit`` bytes, if given.
+    Past that, comments are written to a temporary spool file as they are added,
+    and read back one at a time when needed;
+    only their parent and position in the file are kept in memory."""
+
+    def __init__(self, memory_limit: int = None) -> None:
+        """Initialise an empty store."""
+        self._memory_limit = memory_limit
+        self._memory_size = 0
+        self._comments: dict[str, dict] = {}
+        self._offsets: dict[str, tuple[int, int]] = {}
+        self._parents: dict[str, str] = {}
+        self._spool = None
+
+    def __len__(self) -> int:
+        return len(self._parents)
+
+    def __contains__(self, comment_id: str) -> bool:
+        return comment_id in self._parents
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._parents)
+
+    def __getitem__(self, comment_id: str) -> dict:
+        if comment_id in self._comments:
+            return self._comments[comment_id]
+        offset, size = self._offsets[comment_id]
+        self._spool.seek(offset)
+        return json.loads(self._spool.read(size))
+
+    @property
+    def parents(self) -> dict[str, str]:
+        """Return the fullname of the parent of each comment, indexed by id."""
+        return self._parents
+
+    @property
+    def spilled(self) -> int:
+        """Return the number of comments kept in the spool file."""
+        return len(self._offsets)
+
+    def add(self, comment: dict) -> None:
+        """Add the data of a comment, replacing any previous data of the same id."""
+        comment_id = comment["id"]
+        self._parents[comment_id] = comment["parent_id"]
+        if self._memory_limit is None or comment_id in self._comments:
+            self._comments[comment_id] = comment
+            return
+        line = json.dumps(comment, default=str).encode("utf8")
+        if not self._offsets and self._memory_size + len(line) <= self._memory_limit:
+            self._comments[comment_id] = comment
+            self._memory_size += len(line)
+            return
+        if self._spool is None:
+            self._spool = tempfile.TemporaryFile()
+        offset = self._spool.seek(0, 2)
+        self._spool.write(line)
+        self._offsets[comment_id] = (offset, len(line))
+
+    def update(self, comments: Iterable[dict]) -> None:
+        """Add the data of the given comments."""
+        for comment in comments:
+            self.add(comment)
+
+    def values(self) -> Iterator[dict]:
+        """Yield the data of each comment, in the order they were added."""
+        for comment_id in self._parents:
+            yield self[comment_id]
+
+    def close(self) -> None:
+        """Delete the spool file, if any."""
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
@@ -0,0 +1,40 @@
+"""Walk comment trees stored as flat records."""
+
+from typing import Iterator
+
+
+def sibling_order(comment_id: str) -> tuple[int, str]:
+    """Sorting key of comment ids, matching their creation order."""
+    return (len(comment_id), comment_id)
+
+
+def walk_tree(parents: dict[str, str]) -> Iterator[tuple[str, str, int, int]]:
+    """Yield the id, path, depth, and sibling order of each comment, in thread order.
+
+    ``parents`` maps each comment id to the fullname of its parent.
+    The path is the chain of comment ids from the top level comment, joined by "/".
+    The tree is walked with an explicit stack, so its depth does not matter.
+    Comments whose parent is missing are treated as top level comments."""
+    children = {}
+    roots = []
+    for comment_id, parent in parents.items():
+        parent_id = parent[3:]
+        if parent.startswith("t1_") and parent_id in parents:
+            children.setdefault(parent_id, []).append(comment_id)
+        else:
+            roots.append(comment_id)
+    stack = [
+        (comment_id, None, 0, order)
+        for order, comment_id in reversed(
+            list(enumerate(sorted(roots, key=sibling_order)))
+        )
+    ]
+    while stack:
+        comment_id, parent_path, depth, order = stack.pop()
+        path = f"{parent_path}/{comment_id}" if parent_path else comment_id
+        yield comment_id, path, depth, order
+        replies = sorted(children.pop(comment_id, []), key=sibling_order)
+        stack.extend(
+            (reply_id, path, depth + 1, reply_order)
+            for reply_order, reply_id in reversed(list(enumerate(replies)))
+        )
@@ -0,0 +1,160 @@
+"""Compression of the JSON dumps, detected when reading them.
+
+Dumps are compressed with gzip, or with zstd if the zstandard package is
+installed, optionally with a dictionary trained on the dumps themselves,
+which suits small dumps best.
+Readers tell compressed data from plain JSON by its first bytes,
+so dumps written with or without compression are read the same way."""
+
+import io
+import gzip
+import functools
+import contextlib
+import pathlib
+from typing import IO, BinaryIO, Iterable, Iterator
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional
+    zstandard = None
+
+GZIP = "gzip"
+ZSTD = "zstd"
+MAGIC = {GZIP: b"\x1f\x8b", ZSTD: b"\x28\xb5\x2f\xfd"}
+EXTENSIONS = {GZIP: ".gz", ZSTD: ".zst"}
+DICTIONARY_EXTENSION = ".dict"
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+# Bytes of a trained dictionary
+DICTIONARY_SIZE = 112 * 1024
+
+
+def detect(data: bytes) -> str:
+    """Return the compression of data from its first bytes, None if plain."""
+    for method, magic in MAGIC.items():
+        if data.startswith(magic):
+            return method
+    return None
+
+
+def strip_extension(name: str) -> str:
+    """Remove the compression extension from a file name, if any."""
+    for extension in EXTENSIONS.values():
+        if name.endswith(extension):
+            return name[: -len(extension)]
+    return name
+
+
+def check_method(method: str) -> None:
+    """Raise if the compression method is not available."""
+    if method not in (None, *MAGIC):
+        raise ValueError(f"Unknown compression: {method}")
+    if method == ZSTD and zstandard is None:
+        raise ValueError("zstd compression requires the zstandard package")
+
+
+@functools.lru_cache
+def load_dictionary(file_path: str) -> bytes:
+    """Return the dictionary saved at the given path, None if there is none."""
+    path = pathlib.Path(file_path)
+    return path.read_bytes() if path.is_file() else None
+
+
+def zstd_dictionary(dictionary: bytes) -> "zstandard.ZstdCompressionDict":
+    """Return the zstd dictionary of the given bytes, if any."""
+    return zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+
+
+@contextlib.contextmanager
+def compressed_writer(
+    file: BinaryIO, method: str = None, dictionary: bytes = None
+) -> Iterator[BinaryIO]:
+    """Write to the given file through the compression, leaving it open after."""
+    check_method(method)
+    if method is None:
+        yield file
+        return
+    if method == GZIP:
+        writer = gzip.GzipFile(fileobj=file, mode="wb", compresslevel=GZIP_LEVEL)
+    else:
+        compressor = zstandard.ZstdCompressor(
+            level=ZSTD_LEVEL, dict_data=zstd_dictionary(dictionary)
+        )
+        writer = compressor.stream_writer(file, closefd=False)
+    with writer:
+        yield writer
+
+
+def open_writer(file_path: str, method: str = None, dictionary: bytes = None) -> IO:
+    """Open a text file for writing, compressed with the given method."""
+    check_method(method)
+    if method == GZIP:
+        return gzip.open(file_path, "wt", encoding="utf8", compresslevel=GZIP_LEVEL)
+    if method == ZSTD:
+        compressor = zstandard.ZstdCompressor(
+            level=ZSTD_LEVEL, dict_data=zstd_dictionary(dictionary)
+        )
+        return zstandard.open(file_path, "wt", cctx=compressor, encoding="utf8")
+    return open(file_path, "w", encoding="utf8")
+
+
+def open_reader(file_path: str, dictionary: bytes = None) -> IO[str]:
+    """Open a text file for reading, decompressing it if needed."""
+    with open(file_path, "rb") as f:
+        method = detect(f.read(4))
+    check_method(method)
+    if method == GZIP:
+        return gzip.open(file_path, "rt", encoding="utf8")
+    if method == ZSTD:
+        decompressor = zstandard.ZstdDecompressor(dict_data=zstd_dictionary(dictionary))
+        return zstandard.open(file_path, "rt", dctx=decompressor, encoding="utf8")
+    return open(file_path, encoding="utf8")
+
+
+def wrap_reader(file: io.BufferedReader, dictionary: bytes = None) -> IO[str]:
+    """Return a text reader over a binary file, decompressing it if needed.
+
+    The file is detected from its first bytes without consuming them,
+    and is left open when the reader is closed."""
+    method = detect(file.peek(4))
+    check_method(method)
+    if method == GZIP:
+        file = gzip.GzipFile(fileobj=file, mode="rb")
+    elif method == ZSTD:
+        decompressor = zstandard.ZstdDecompressor(dict_data=zstd_dictionary(dictionary))
+        file = decompressor.stream_reader(file, closefd=False)
+    else:
+        file = io.BufferedReader(NonClosing(file))
+    return io.TextIOWrapper(file, encoding="utf8")
+
+
+class NonClosing(io.RawIOBase):
+    """A binary file passed through, left open when closed."""
+
+    def __init__(self, file: BinaryIO) -> None:
+        self._file = file
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: bytearray) -> int:
+        return self._file.readinto(buffer)
+
+
+def decompress(data: bytes, dictionary: bytes = None) -> bytes:
+    """Return the given data decompressed, or as is if plain."""
+    method = detect(data)
+    check_method(method)
+    if method == GZIP:
+        return gzip.decompress(data)
+    if method == ZSTD:
+        decompressor = zstandard.ZstdDecompressor(dict_data=zstd_dictionary(dictionary))
+        return decompressor.stream_reader(data).read()
+    return data
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = DICTIONARY_SIZE) -> bytes:
+    """Return a zstd dictionary trained on the given samples."""
+    check_method(ZSTD)
+    return zstandard.train_dictionary(size, list(samples)).as_bytes()
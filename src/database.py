@@ -10,6 +10,13 @@ REWATCH_PATH = "src\\queries\\rewatch"
 WRITING_PATH = "src\\queries\\writing"
 DISCUSSION_PATH = "src\\queries\\discussion"
 TABLE_QUERY = "table_setup.sql"
+EPISODE_PROCESSED_QUERY = "migrate_episode_processed.sql"
+COMMENT_TREE_PATHS_QUERY = "src\\queries\\migrate_comment_tree_paths.sql"
+COMMENT_SUBTREE_QUERY = "src\\queries\\comment_subtree.sql"
+WIKI_SECTION_QUERY = "src\\queries\\migrate_wiki_section.sql"
+MEDIA_LINK_QUERY = "src\\queries\\migrate_media_link.sql"
+PARSED_FILE_QUERY = "src\\queries\\migrate_parsed_file.sql"
+IMGUR_DATA_QUERY = "src\\queries\\migrate_imgur_data.sql"
 
 
 def dict_factory(cursor: sqlite3.Cursor, row: sqlite3.Row) -> dict:
@@ -40,6 +47,45 @@ class Database(abc.ABC):
     def setup_tables(self) -> None:
         """Create tables."""
 
+    def migrate(self) -> None:
+        """Update the tables of a db created with an older setup."""
+        if not self.has_column("comment_tree", "path"):
+            self.execute_script(COMMENT_TREE_PATHS_QUERY)
+        if not self.has_column("media_link", "link"):
+            self.execute_script(MEDIA_LINK_QUERY)
+        if not self.has_column("parsed_file", "content_hash"):
+            self.execute_script(PARSED_FILE_QUERY)
+        if not self.has_column("imgur_album_image", "position"):
+            self.execute_script(IMGUR_DATA_QUERY)
+
+    def comment_subtree(self, comment_id: str) -> list[dict]:
+        """Return the comment tree entries of all replies under the given comment.
+
+        Replies are in depth-first order."""
+        with open(COMMENT_SUBTREE_QUERY, encoding="utf8") as f:
+            return self.q.execute(f.read(), (comment_id,)).fetchall()
+
+    def comment_ancestors(self, comment_id: str) -> list[str]:
+        """Return the ids of the comments above the given one, top level first."""
+        entry = self.q.execute(
+            "SELECT path FROM comment_tree WHERE comment_id = ?", (comment_id,)
+        ).fetchone()
+        if not entry:
+            return []
+        return entry["path"].split("/")[:-1]
+
+    def has_column(self, table: str, column: str) -> bool:
+        """Return whether the table has the given column."""
+        columns = self.q.execute(f"PRAGMA table_info({table})").fetchall()
+        return any(entry["name"] == column for entry in columns)
+
+    def execute_script(self, query_path: str) -> None:
+        """Execute the queries in the given file."""
+        with open(query_path, encoding="utf8") as f:
+            query = f.read()
+        self.q.executescript(query)
+        logging.info("Query executed: %s", query_path)
+
     @property
     def last_row_id(self) -> int:
         """Return the last inserted row id.
@@ -59,6 +105,19 @@ class Database(abc.ABC):
         """Rollback transaction."""
         self._db.rollback()
 
+    def savepoint(self, name: str) -> None:
+        """Start a savepoint within the transaction."""
+        self.q.execute(f"SAVEPOINT {name}")
+
+    def release(self, name: str) -> None:
+        """Keep the changes made since the savepoint."""
+        self.q.execute(f"RELEASE {name}")
+
+    def rollback_to(self, name: str) -> None:
+        """Undo the changes made since the savepoint."""
+        self.q.execute(f"ROLLBACK TO {name}")
+        self.q.execute(f"RELEASE {name}")
+
 
 class DatabaseRewatch(Database):
     """Rewatch database."""
@@ -70,6 +129,14 @@ class DatabaseRewatch(Database):
         self.q.executescript(query)
         logging.info("Query executed: %s", f"{REWATCH_PATH}\\{TABLE_QUERY}")
 
+    def migrate(self) -> None:
+        """Update the tables of a db created with an older setup."""
+        super().migrate()
+        if not self.has_column("episode", "processed"):
+            self.execute_script(f"{REWATCH_PATH}\\{EPISODE_PROCESSED_QUERY}")
+        if not self.has_column("wiki_section", "content_hash"):
+            self.execute_script(WIKI_SECTION_QUERY)
+
 
 class DatabaseWriting(Database):
     """Writing database."""
@@ -91,10 +158,19 @@ class DatabaseDiscussion(Database):
         self.q.executescript(query)
         logging.info("Query executed: %s", f"{DISCUSSION_PATH}\\{TABLE_QUERY}")
 
+    def migrate(self) -> None:
+        """Update the tables of a db created with an older setup."""
+        super().migrate()
+        if not self.has_column("episode", "processed"):
+            self.execute_script(f"{DISCUSSION_PATH}\\{EPISODE_PROCESSED_QUERY}")
+        if not self.has_column("wiki_section", "content_hash"):
+            self.execute_script(WIKI_SECTION_QUERY)
+
 
 def create_database(db: Database) -> None:
     """Create db and set up tables."""
     db.setup_tables()
+    db.migrate()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,156 @@
+"""Storage of the API data of the imgur images and albums in the db.
+
+The data of each image and album is kept whole, as JSON, along with
+the columns needed to query it, and the images of each album in order.
+Data saved as files (or packs) by older versions of the scraper is imported
+with ``import_data``."""
+
+import json
+import glob
+from typing import Iterator
+from database import Database
+from pack_store import PACK_EXTENSION, PackStore
+from compression import decompress, open_reader
+
+IMAGE_QUERY = "src\\queries\\add_imgur_images.sql"
+ALBUM_QUERY = "src\\queries\\add_imgur_albums.sql"
+ALBUM_IMAGE_QUERY = "src\\queries\\add_imgur_album_images.sql"
+
+IMAGE_DATA_PATH = "image_data"
+ALBUM_DATA_PATH = "album_data"
+
+# Images and albums imported per transaction
+IMPORT_BATCH = 1000
+
+
+def image_row(data: dict) -> dict:
+    """Return the values of the image columns of the given API data."""
+    return {
+        "image_id": data["id"],
+        "title": data.get("title"),
+        "description": data.get("description"),
+        "uploaded": data.get("datetime"),
+        "type": data.get("type"),
+        "animated": data.get("animated"),
+        "width": data.get("width"),
+        "height": data.get("height"),
+        "size": data.get("size"),
+        "link": data["link"],
+        "data": json.dumps(data),
+    }
+
+
+def album_row(data: dict) -> dict:
+    """Return the values of the album columns of the given API data.
+
+    Images are given either whole or by id; only their ids are kept."""
+    image_ids = [album_image_id(image) for image in data.get("images", ())]
+    return {
+        "album_id": data["id"],
+        "title": data.get("title"),
+        "description": data.get("description"),
+        "uploaded": data.get("datetime"),
+        "images_count": data.get("images_count", len(image_ids)),
+        "link": data.get("link"),
+        "data": json.dumps({**data, "images": image_ids}),
+    }
+
+
+def album_image_id(image: dict | str) -> str:
+    """Return the id of an image of an album, given whole or by id."""
+    return image if isinstance(image, str) else image["id"]
+
+
+class ImgurDataWriter:
+    """Collect the data of images and albums, and insert them together.
+
+    The rows are inserted with one query per table, within the transaction
+    of the caller, when flushed."""
+
+    def __init__(self, db: Database) -> None:
+        self._db = db
+        with open(IMAGE_QUERY, encoding="utf8") as f:
+            self._image_query = f.read()
+        with open(ALBUM_QUERY, encoding="utf8") as f:
+            self._album_query = f.read()
+        with open(ALBUM_IMAGE_QUERY, encoding="utf8") as f:
+            self._album_image_query = f.read()
+        self._images: list[dict] = []
+        self._albums: list[dict] = []
+        self._album_images: list[tuple[str, str, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._images) + len(self._albums)
+
+    def add_image(self, data: dict) -> None:
+        """Add the data of a downloaded image."""
+        self._images.append(image_row(data))
+
+    def add_album(self, data: dict) -> None:
+        """Add the data of an album, and the list of its images.
+
+        The images themselves are added as they are downloaded."""
+        self._albums.append(album_row(data))
+        self._album_images.extend(
+            (data["id"], album_image_id(image), position)
+            for position, image in enumerate(data.get("images", ()))
+        )
+
+    def flush(self) -> None:
+        """Insert the rows added since the last flush.
+
+        The image lists of the albums added replace their previous ones."""
+        self._db.q.executemany(self._image_query, self._images)
+        self._db.q.executemany(self._album_query, self._albums)
+        self._db.q.executemany(
+            "DELETE FROM imgur_album_image WHERE album_id = ?",
+            ((album["album_id"],) for album in self._albums),
+        )
+        self._db.q.executemany(self._album_image_query, self._album_images)
+        self.clear()
+
+    def clear(self) -> None:
+        """Drop the rows added since the last flush."""
+        self._images = []
+        self._albums = []
+        self._album_images = []
+
+
+def saved_data(path: str, kind: str) -> Iterator[dict]:
+    """Yield the data saved as files, then in the pack, of the given kind.
+
+    Compressed files and records are decompressed."""
+    for file_path in glob.iglob(f"{path}\\{kind}\\*.json*"):
+        with open_reader(file_path) as f:
+            yield json.load(f)
+    with PackStore(f"{path}\\{kind}{PACK_EXTENSION}", read_only=True) as pack:
+        for _, data in pack.records():
+            yield json.loads(decompress(data))
+
+
+def import_data(path: str, db: Database, batch_size: int = IMPORT_BATCH) -> None:
+    """Import the image and album data saved in the given path into the db.
+
+    Data already in the db is replaced."""
+    db.migrate()
+    writer = ImgurDataWriter(db)
+    for kind, add in (
+        (IMAGE_DATA_PATH, writer.add_image),
+        (ALBUM_DATA_PATH, writer.add_album),
+    ):
+        count = 0
+        db.begin()
+        try:
+            for data in saved_data(path, kind):
+                add(data)
+                count += 1
+                if len(writer) >= batch_size:
+                    writer.flush()
+                    db.commit()
+                    db.begin()
+            writer.flush()
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        print(f"{count} {kind} entries imported")
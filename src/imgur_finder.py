@@ -1,10 +1,43 @@
 """Find, download, and map all imgur links in the given path."""
 
-import pathlib
-import glob
+import os
 import re
+import glob
+import mmap
+import pathlib
+import concurrent.futures
+from database import Database
 
 IMGUR = re.compile(r"\[([^\[\]]*)\]\(([^\(]*imgur\.com[^\)]*)\)")
+IMGUR_BYTES = re.compile(IMGUR.pattern.encode("utf8"))
+
+WIKI_LINKS_TABLE_QUERY = "src\\queries\\wiki_imgur_links.sql"
+
+# Files from this size (in bytes) are memory-mapped instead of read
+MMAP_SIZE = 1024 * 1024
+# Files sent to a worker process at a time
+CHUNK_SIZE = 16
+
+
+def decode(match: bytes) -> str:
+    """Decode text matched in a memory-mapped file, with universal newlines."""
+    return match.decode("utf8").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def get_links_from_file(file_name: str) -> list[tuple[str, str]]:
+    """Return the (text, link) pairs of the imgur links in the given file.
+
+    Large files are memory-mapped and scanned in place, without
+    reading them into a string, with the same results."""
+    if os.path.getsize(file_name) < MMAP_SIZE:
+        with open(file_name, encoding="utf8") as f:
+            return IMGUR.findall(f.read())
+    with open(file_name, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as contents:
+        return [
+            (decode(text), decode(link)) for text, link in IMGUR_BYTES.findall(contents)
+        ]
 
 
 class Imgur:
@@ -17,20 +50,77 @@ class Imgur:
         self._file_path.parent.mkdir(parents=True, exist_ok=True)
 
     def trim_file_path(self, file_path: str) -> str:
-        """Remove the local folder structure, as well as the txt extension."""
-        return file_path[len(self._path) : -4]
+        """Remove the local folder structure, as well as the md extension."""
+        return file_path[len(self._path) :].removesuffix(".md")
 
-    def generate_links(self, recursive: bool = True) -> None:
-        """Create a file with the links."""
-        files = glob.iglob(f"{self._path}**.md", recursive=recursive)
-        with self._file_path.open("w", encoding="utf8") as g:
+    def scan(
+        self, recursive: bool = True, workers: int = 1
+    ) -> dict[str, list[tuple[str, str]]]:
+        """Return the links of each file, in the order of their names.
+
+        Files without links are included, with an empty list.
+        With more than one worker, files are scanned in parallel processes,
+        and the results are still merged in the same order."""
+        files = sorted(glob.iglob(f"{self._path}**.md", recursive=recursive))
+        if workers == 1:
+            results = []
             for file_name in files:
                 print(f"Checking: {file_name}")
-                links = self.get_links_from_file(file_name)
-                if links:
-                    g.write(
-                        f"{self.trim_file_path(file_name)}\n{self.format_list(links)}\n\n"
-                    )
+                results.append(get_links_from_file(file_name))
+        else:
+            print(f"Checking {len(files)} files with {workers} workers")
+            with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+                results = list(
+                    executor.map(get_links_from_file, files, chunksize=CHUNK_SIZE)
+                )
+        return dict(zip(files, results))
+
+    def generate_links(
+        self, recursive: bool = True, workers: int = 1, db: Database = None
+    ) -> None:
+        """Create a file with the links, and save them in the db if given."""
+        links = self.scan(recursive=recursive, workers=workers)
+        with self._file_path.open("w", encoding="utf8") as g:
+            for file_name, entries in links.items():
+                if not entries:
+                    continue
+                g.write(
+                    f"{self.trim_file_path(file_name)}\n{self.format_list(entries)}\n\n"
+                )
+        if db is not None:
+            self.save_links(db, links)
+
+    def save_links(self, db: Database, links: dict[str, list[tuple[str, str]]]) -> None:
+        """Replace the links of the scanned pages in the db, in one transaction.
+
+        The links of the pages whose file no longer exists are deleted."""
+        db.execute_script(WIKI_LINKS_TABLE_QUERY)
+        db.begin()
+        try:
+            pages = {self.trim_file_path(file_name) for file_name in links}
+            db.q.executemany(
+                "DELETE FROM wiki_imgur_link WHERE page = ?",
+                (
+                    (entry["page"],)
+                    for entry in db.q.execute(
+                        "SELECT DISTINCT page FROM wiki_imgur_link"
+                    ).fetchall()
+                    if entry["page"] not in pages
+                    and not os.path.isfile(f"{self._path}{entry['page']}.md")
+                ),
+            )
+            for file_name, entries in links.items():
+                page = self.trim_file_path(file_name)
+                db.q.execute("DELETE FROM wiki_imgur_link WHERE page = ?", (page,))
+                db.q.executemany(
+                    "INSERT OR IGNORE INTO wiki_imgur_link "
+                    "(page, imgur_link, link_text) VALUES (?, ?, ?)",
+                    ((page, link, text) for text, link in entries),
+                )
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
 
     @staticmethod
     def format_list(entries: tuple) -> str:
@@ -38,13 +128,11 @@ class Imgur:
         return "\n".join(f"{link} - {text}" for text, link in entries)
 
     @staticmethod
-    def get_links_from_file(file_name: str) -> list[str]:
+    def get_links_from_file(file_name: str) -> list[tuple[str, str]]:
         """Return the list of imgur links in the given file."""
-        with open(file_name, encoding="utf8") as f:
-            contents = f.read()
-        return IMGUR.findall(contents)
+        return get_links_from_file(file_name)
 
 
 if __name__ == "__main__":
     imgur = Imgur("data\\wiki\\anime\\")
-    imgur.generate_links()
+    imgur.generate_links(workers=os.cpu_count())
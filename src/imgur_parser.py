@@ -1,71 +1,482 @@
-"""Finding and saving imgur links."""
+"""Finding and saving imgur links, and the links of other image hosts.
 
+Dump files are parsed lazily, one comment at a time, by a pool of processes,
+and the links found are sent back to a single writer,
+which inserts them into the db in batches, one transaction per batch.
+Files already parsed are skipped, unless their contents changed since.
+Compressed dumps are detected and decompressed as they are read."""
+
+import io
+import os
 import json
 import re
+import hashlib
 import glob
 import pathlib
 import itertools
+import concurrent.futures
+from dataclasses import dataclass
+from typing import IO, Any, Iterable, Iterator
 from database import Database
-
-IMGUR = re.compile(
-    r"((?:https?:\/\/)?(?:i\.|m\.|www\.)?(?:stack\.)?imgur\.com\/(?:a\/|gallery\/)?[a-zA-Z0-9]{4,}(?:\.\w+)?)"
+from link_scanner import IMGUR, SCANNER
+from pack_store import PACK_EXTENSION, PackStore, open_record
+from compression import (
+    DICTIONARY_EXTENSION,
+    decompress,
+    load_dictionary,
+    open_reader,
+    strip_extension,
+    wrap_reader,
 )
 
+JSON_LINES_EXTENSION = ".jsonl"
+MEDIA_QUERY = "src\\queries\\add_media_links.sql"
+# Link tables, with their link column
+LINK_TABLES = {"imgur_link": "imgur_link", "media_link": "link"}
+
+# Characters read from a JSON file at a time
+READ_SIZE = 64 * 1024
+# Bytes of a file hashed at a time
+HASH_READ_SIZE = 1024 * 1024
+# Links inserted into the db per transaction
+WRITE_BATCH = 10000
+# Files sent to a worker process at a time
+CHUNK_SIZE = 16
+
+DECODER = json.JSONDecoder()
+WHITESPACE = re.compile(r"\s*")
+
+
+@dataclass(frozen=True)
+class Dump:
+    """The dump of a submission: a file, or a record in the pack of the dumps.
+
+    ``name`` identifies the dump in the db. A record has no modification time,
+    its offset is used instead, as it changes whenever the record is written.
+    ``dictionary`` is the path of the zstd dictionary of the dumps, if any."""
+
+    name: str
+    post_id: str
+    path: str
+    size: int
+    mtime_ns: int
+    offset: int = None
+    dictionary: str = None
+
 
 class ImgurParser:
-    """Imgur links parsing and storing into db."""
+    """Imgur links parsing and storing into db.
 
-    def __init__(self, path: str, db: Database) -> None:
+    The dumps are the files in _path, and the records of the pack next to it.
+    The dumps parsed are recorded in the db with their size, modification time,
+    and content hash, so that the next runs only parse new or changed dumps."""
+
+    def __init__(self, path: str, db: Database, batch_size: int = WRITE_BATCH) -> None:
         self._db = db
         self._path = path
+        self._batch_size = batch_size
+
+    def process(
+        self, query_path: str, workers: int = 1, media_query_path: str = MEDIA_QUERY
+    ) -> None:
+        """Process the new or changed dumps.
 
-    def process(self, query_path: str) -> None:
-        """Process the files in _path"""
+        Dumps are parsed in parallel processes if more than one worker.
+        Imgur links are inserted with the query at ``query_path``,
+        and the links of the other hosts with the one at ``media_query_path``.
+        The links are inserted into the db by this process only."""
         with open(query_path, encoding="utf8") as f:
             query = f.read()
-        for n, file_path in enumerate(glob.iglob(f"{self._path}\\*"), 1):
-            print(f"Processing #{n}: {post_id(file_path)}")
-            data = parse_file(file_path)
+        with open(media_query_path, encoding="utf8") as f:
+            media_query = f.read()
+        dumps = self.changed_dumps()
+        known_hashes = [entry and entry["content_hash"] for _, entry in dumps]
+        if workers == 1:
+            results = map(dump_links, (dump for dump, _ in dumps), known_hashes)
+            self.write(query, media_query, dumps, results)
+        else:
+            with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+                results = executor.map(
+                    dump_links,
+                    (dump for dump, _ in dumps),
+                    known_hashes,
+                    chunksize=CHUNK_SIZE,
+                )
+                self.write(query, media_query, dumps, results)
+        print("done")
+
+    def changed_dumps(self) -> list[tuple[Dump, dict]]:
+        """Return the dumps whose size or modification time changed since parsed.
+
+        Each dump comes with its entry in the db, if any.
+        Files come first, in the order of their names,
+        then the records of the pack, in the order they were written."""
+        ledger = parsed_files(self._db)
+        dictionary = f"{self._path}{DICTIONARY_EXTENSION}"
+        dumps = []
+        for file_path in sorted(glob.iglob(f"{self._path}\\*")):
+            stat = os.stat(file_path)
+            dumps.append(
+                Dump(
+                    name=self.file_name(file_path),
+                    post_id=post_id(file_path),
+                    path=file_path,
+                    size=stat.st_size,
+                    mtime_ns=stat.st_mtime_ns,
+                    dictionary=dictionary,
+                )
+            )
+        pack_path = f"{self._path}{PACK_EXTENSION}"
+        if os.path.isfile(pack_path):
+            with PackStore(pack_path, read_only=True) as pack:
+                locations = sorted(pack.locations().items(), key=lambda item: item[1])
+            for record_id, (offset, length) in locations:
+                dumps.append(
+                    Dump(
+                        name=f"{record_id}{PACK_EXTENSION}",
+                        post_id=record_id,
+                        path=pack_path,
+                        size=length,
+                        mtime_ns=offset,
+                        offset=offset,
+                        dictionary=dictionary,
+                    )
+                )
+        changed = [
+            (dump, ledger.get(dump.name))
+            for dump in dumps
+            if dump.name not in ledger
+            or (ledger[dump.name]["size"], ledger[dump.name]["mtime_ns"])
+            != (dump.size, dump.mtime_ns)
+        ]
+        print(f"{len(changed)}/{len(dumps)} new or changed dumps")
+        return changed
+
+    def file_name(self, file_path: str) -> str:
+        """Return the path of a file relative to _path."""
+        return file_path[len(self._path) + 1 :]
+
+    def write(
+        self,
+        query: str,
+        media_query: str,
+        dumps: list[tuple[Dump, dict]],
+        results: Iterable[tuple[str, list[tuple[str, int, str, str]]]],
+    ) -> None:
+        """Save the links found in each dump, as they come, in batches."""
+        batch = []
+        rows = 0
+        for n, ((dump, entry), (content_hash, links)) in enumerate(
+            zip(dumps, results), 1
+        ):
+            print(f"Processing #{n}: {dump.post_id}")
+            batch.append((dump, entry, content_hash, links))
+            rows += len(links or ())
+            if rows >= self._batch_size:
+                self.save(query, media_query, batch)
+                batch = []
+                rows = 0
+        self.save(query, media_query, batch)
+
+    def save(
+        self,
+        query: str,
+        media_query: str,
+        batch: list[tuple[Dump, dict, str, list[tuple[str, int, str, str]]]],
+    ) -> None:
+        """Save the links of a batch of dumps in a single transaction.
+
+        The links of a dump parsed before replace its previous ones,
+        and the links of a dump whose contents did not change are left as is."""
+        self._db.begin()
+        try:
+            for dump, entry, content_hash, links in batch:
+                if links is not None:
+                    if entry is not None:
+                        self.delete_stale_links(dump.post_id, links)
+                    self.insert(query, media_query, links)
+                save_parsed_file(
+                    self._db, dump.name, dump.size, dump.mtime_ns, content_hash
+                )
+            self._db.commit()
+        except BaseException:
+            self._db.rollback()
+            raise
+
+    def insert(
+        self, query: str, media_query: str, rows: list[tuple[str, int, str, str]]
+    ) -> None:
+        """Insert the links of a dump."""
+        self._db.q.executemany(
+            query,
+            (
+                (comment_id, is_submission, link)
+                for comment_id, is_submission, host, link in rows
+                if host == "imgur"
+            ),
+        )
+        self._db.q.executemany(media_query, (row for row in rows if row[2] != "imgur"))
+
+    def delete_stale_links(
+        self, post: str, rows: list[tuple[str, int, str, str]]
+    ) -> None:
+        """Delete the links of a submission and its comments no longer found.
+
+        Links still found are kept, along with their download and archive status."""
+        links = {
+            (comment_id, is_submission, link)
+            for comment_id, is_submission, _, link in rows
+        }
+        for table, column in LINK_TABLES.items():
+            entries = self._db.q.execute(
+                f"SELECT id, comment_id, is_submission, {column} AS link FROM {table} "
+                "WHERE (is_submission = 1 AND comment_id = :post_id) "
+                "OR (is_submission = 0 AND comment_id IN "
+                "(SELECT comment_id FROM comment_tree WHERE post_id = :post_id))",
+                {"post_id": post},
+            ).fetchall()
             self._db.q.executemany(
-                query,
-                data,
+                f"DELETE FROM {table} WHERE id = ?",
+                (
+                    (entry["id"],)
+                    for entry in entries
+                    if (entry["comment_id"], entry["is_submission"], entry["link"])
+                    not in links
+                ),
             )
-        print("done")
+
+
+def parsed_files(db: Database) -> dict[str, dict]:
+    """Return the entry of each parsed file in the db, by file name."""
+    return {
+        entry["file_name"]: entry
+        for entry in db.q.execute(
+            "SELECT file_name, size, mtime_ns, content_hash FROM parsed_file"
+        ).fetchall()
+    }
+
+
+def save_parsed_file(
+    db: Database, file_name: str, size: int, mtime_ns: int, content_hash: str
+) -> None:
+    """Save the stats and content hash of a parsed file."""
+    db.q.execute(
+        "INSERT INTO parsed_file (file_name, size, mtime_ns, content_hash) "
+        "VALUES (?, ?, ?, ?) ON CONFLICT (file_name) DO UPDATE SET "
+        "size = excluded.size, mtime_ns = excluded.mtime_ns, "
+        "content_hash = excluded.content_hash",
+        (file_name, size, mtime_ns, content_hash),
+    )
+
+
+def file_hash(path: str) -> str:
+    """Return the hash of the contents of a file."""
+    content_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_READ_SIZE):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
 
 
 def post_id(path: str) -> str:
     """Get the submission id from file name."""
-    return pathlib.Path(path).stem
-
-
-def parse_file(path: str) -> itertools.chain:
-    """Do the thing."""
-    post, comments = parse_json(path)
-    data = itertools.chain(
-        process_comment(post),
-        *(
-            stuff
-            for comment in comments.values()
-            if (stuff := process_comment(comment))
-        ),
-    )
-    return data
+    return pathlib.Path(strip_extension(path)).stem
 
 
-def process_comment(comment: dict) -> tuple[str, int, str]:
-    """Process a comment and return the corresponding data to insert into the db."""
-    links = find_imgur_links(comment["body"])
+def dump_links(
+    dump: Dump, known_hash: str = None
+) -> tuple[str, list[tuple[str, int, str, str]]]:
+    """Return the content hash and link data of a dump, to be sent back from a worker.
+
+    If the hash is the known one, the dump is not parsed, and no links are returned.
+    Records of a pack hold the dump in JSON Lines format. They are read lazily,
+    one comment at a time, and hashed along the way; a record whose hash
+    turns out to be the known one has its links dropped."""
+    dictionary = load_dictionary(dump.dictionary) if dump.dictionary else None
+    if dump.offset is None:
+        return file_links(dump.path, known_hash, dictionary)
+    with open_record(dump.path, dump.offset, dump.size) as record:
+        hashing = HashingReader(record)
+        with wrap_reader(io.BufferedReader(hashing), dictionary) as f:
+            links = list(
+                itertools.chain.from_iterable(
+                    process_comment(entry) for entry in json_lines(f)
+                )
+            )
+            # Bytes left after the data, if any, are hashed too
+            while hashing.read(HASH_READ_SIZE):
+                pass
+    content_hash = hashing.hexdigest()
+    if content_hash == known_hash:
+        return content_hash, None
+    return content_hash, links
+
+
+class HashingReader(io.RawIOBase):
+    """A binary file passed through, hashing its bytes as they are read."""
+
+    def __init__(self, file: io.BufferedReader) -> None:
+        self._file = file
+        self._hash = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: bytearray) -> int:
+        read = self._file.readinto(buffer)
+        self._hash.update(memoryview(buffer)[:read])
+        return read
+
+    def hexdigest(self) -> str:
+        """Return the hash of the bytes read so far."""
+        return self._hash.hexdigest()
+
+
+def file_links(
+    path: str, known_hash: str = None, dictionary: bytes = None
+) -> tuple[str, list[tuple[str, int, str, str]]]:
+    """Return the content hash and link data of the file, to be sent back from a worker.
+
+    If the hash is the known one, the file is not parsed, and no links are returned."""
+    content_hash = file_hash(path)
+    if content_hash == known_hash:
+        return content_hash, None
+    return content_hash, list(parse_file(path, dictionary))
+
+
+def parse_file(
+    path: str, dictionary: bytes = None
+) -> Iterator[tuple[str, int, str, str]]:
+    """Return the link data of the submission and comments in the file.
+
+    Both JSON and JSON Lines files are read lazily, one comment at a time,
+    whether compressed or not."""
+    if strip_extension(path).endswith(JSON_LINES_EXTENSION):
+        entries = parse_json_lines(path, dictionary)
+    else:
+        entries = parse_json_stream(path, dictionary)
+    return itertools.chain.from_iterable(process_comment(entry) for entry in entries)
+
+
+def process_comment(comment: dict) -> tuple[str, int, str, str]:
+    """Process a comment and return the corresponding data to insert into the db.
+
+    Each link comes with the name of its host."""
+    links = SCANNER.scan(comment["body"])
     is_submission = 0 if "depth" in comment else 1
-    return ((comment["id"], is_submission, link) for link in links)
+    return ((comment["id"], is_submission, host, link) for host, link in links)
 
 
-def parse_json(file_path: str) -> None:
-    """parse json file."""
-    with open(file_path, encoding="utf8") as f:
+def parse_json(file_path: str, dictionary: bytes = None) -> None:
+    """parse json file, compressed or not."""
+    with open_reader(file_path, dictionary) as f:
         post, comments = json.load(f)
     return post, comments
 
 
+def parse_json_stream(file_path: str, dictionary: bytes = None) -> Iterator[dict]:
+    """Yield the submission, then each comment, of a JSON file.
+
+    The file holds ``[submission, {comment_id: comment, ...}]``,
+    and is decoded one value at a time instead of being loaded whole."""
+    with open_reader(file_path, dictionary) as f:
+        stream = JsonStream(f)
+        stream.expect("[")
+        yield stream.value()
+        stream.expect(",")
+        stream.expect("{")
+        if stream.peek() == "}":
+            stream.expect("}")
+        else:
+            while True:
+                stream.value()
+                stream.expect(":")
+                yield stream.value()
+                if stream.expect(",}") == "}":
+                    break
+        stream.expect("]")
+
+
+class JsonStream:
+    """Incremental decoding of a JSON document, read from a file in chunks."""
+
+    def __init__(self, file: IO[str]) -> None:
+        self._file = file
+        self._buffer = ""
+        self._position = 0
+
+    def fill(self) -> bool:
+        """Read the next chunk of the file, and return whether there was any."""
+        chunk = self._file.read(READ_SIZE)
+        if not chunk:
+            return False
+        self._buffer = self._buffer[self._position :] + chunk
+        self._position = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next character that is not whitespace, without consuming it."""
+        while True:
+            self._position = WHITESPACE.match(self._buffer, self._position).end()
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def expect(self, characters: str) -> str:
+        """Consume the next character, which must be one of the given ones."""
+        character = self.peek()
+        if character not in characters:
+            raise ValueError(
+                f"Expected one of {characters!r} at {self._position}, "
+                f"found {character!r}"
+            )
+        self._position += 1
+        return character
+
+    def value(self) -> Any:
+        """Decode the next JSON value, reading more of the file as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self._buffer) and self.fill():
+                continue
+            self._position = end
+            return value
+
+
+def dump_data(path: str) -> Iterator[bytes]:
+    """Yield the decompressed contents of the dump files, then of the pack records."""
+    dictionary = load_dictionary(f"{path}{DICTIONARY_EXTENSION}")
+    for file_path in sorted(glob.iglob(f"{path}\\*")):
+        with open(file_path, "rb") as f:
+            yield decompress(f.read(), dictionary)
+    pack_path = f"{path}{PACK_EXTENSION}"
+    if os.path.isfile(pack_path):
+        with PackStore(pack_path, read_only=True) as pack:
+            for _, data in pack.records():
+                yield decompress(data, dictionary)
+
+
+def parse_json_lines(file_path: str, dictionary: bytes = None) -> Iterator[dict]:
+    """Yield the submission, then each comment, of a JSON Lines file."""
+    with open_reader(file_path, dictionary) as f:
+        yield from json_lines(f)
+
+
+def json_lines(file: IO[str]) -> Iterator[dict]:
+    """Yield the value of each line of an open JSON Lines file, skipping blank ones."""
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
 def find_imgur_links(text: str) -> None:
     """Return the unique imgur links contained in a comment."""
     return set(IMGUR.findall(text))
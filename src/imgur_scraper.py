@@ -2,7 +2,6 @@
 
 import configparser
 import re
-import json
 import pathlib
 import shutil
 import logging
@@ -10,6 +9,7 @@ from typing import Iterator
 import requests
 import ratelimit
 from database import Database
+from imgur_data import ImgurDataWriter
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +22,6 @@ GALLERY_ID = re.compile(r"imgur.com\/gallery\/(\w+)")
 STACK_ID = re.compile(r"i\.stack\.imgur\.com\/(\w+(?:\.\w+)?)")
 FILE_TYPE = re.compile(r"\w+\/(\w+)")
 
-DATA_PATH = "image_data"
 FILE_PATH = "images"
 SPECIAL_PATH = "special"
 
@@ -46,7 +45,10 @@ class Exception429(Exception):
 
 
 class ScraperImgur:
-    """The scraper."""
+    """The scraper.
+
+    The API data of the images and albums downloaded for a link is saved
+    in the db, in the same transaction as the link."""
 
     def __init__(self, path: str, db: Database, config_id: int = 0) -> None:
         self._config_id = config_id
@@ -56,6 +58,7 @@ class ScraperImgur:
         self._client_id = config[config_section]["client_id"]
         self._path = path
         self._db = db
+        self._data = ImgurDataWriter(db)
 
     def get_links(self) -> Iterator[str]:
         """Get the list of links from the database."""
@@ -68,26 +71,27 @@ class ScraperImgur:
             yield link
 
     def create_base_paths(self) -> None:
-        """Create paths for image data if they do not exist."""
-        data_path = pathlib.Path(f"{self._path}\\{DATA_PATH}")
+        """Create paths for images if they do not exist."""
         file_path = pathlib.Path(f"{self._path}\\{FILE_PATH}")
         special_path = pathlib.Path(f"{self._path}\\{SPECIAL_PATH}")
-        data_path.mkdir(parents=True, exist_ok=True)
         file_path.mkdir(parents=True, exist_ok=True)
         special_path.mkdir(parents=True, exist_ok=True)
 
     def scrape(self) -> None:
         """Scrape the links."""
         self.create_base_paths()
+        self._db.migrate()
         for link in self.get_links():
             self._db.begin()
             try:
                 self.download_link(link)
+                self._data.flush()
                 self._db.q.execute(
                     "UPDATE imgur_link SET processed = 1 WHERE imgur_link = ?", (link,)
                 )
                 self._db.commit()
             except Exception404:
+                self._data.flush()
                 self._db.q.execute(
                     "UPDATE imgur_link SET error404 = 1 WHERE imgur_link = ?", (link,)
                 )
@@ -95,6 +99,7 @@ class ScraperImgur:
             except Exception429 as e:
                 print(f"An exception has occurred: {e}")
                 logger.error("Configuration #%s returned a 429 error", self._config_id)
+                self._data.clear()
                 self._db.rollback()
                 return
             except Exception as e:
@@ -102,6 +107,7 @@ class ScraperImgur:
                 logger.error(
                     "An exception has occurred when processing %s: %s", link, e
                 )
+                self._data.clear()
                 self._db.rollback()
 
     def download_link(self, url: str) -> None:
@@ -154,15 +160,15 @@ class ScraperImgur:
     @ratelimit.sleep_and_retry
     @ratelimit.limits(calls=5, period=1)
     def download_image(self, image_data: dict) -> None:
-        """Download an image and its data from imgur."""
+        """Download an image from imgur, and add its data."""
         image_url = image_data["link"]
         image_id = image_data["id"]
         file_type = FILE_TYPE.search(image_data["type"]).group(1)
-        data_path = pathlib.Path(f"{self._path}\\{DATA_PATH}\\{image_id}.json")
         file_path = pathlib.Path(f"{self._path}\\{FILE_PATH}\\{image_id}.{file_type}")
         if file_path.is_file():
             print("The image already exists")
             logger.info("The image %s already exists", image_id)
+            self._data.add_image(image_data)
             return
         r = requests.get(url=image_url, timeout=DEFAULT_TIMEOUT, stream=True)
         if r.status_code != 200:
@@ -177,8 +183,7 @@ class ScraperImgur:
         with file_path.open("wb") as f:
             r.raw.decode_content = True
             shutil.copyfileobj(r.raw, f)
-        with data_path.open("w", encoding="utf8") as f:
-            f.write(json.dumps(image_data))
+        self._data.add_image(image_data)
         print(f"Image at {image_url} downloaded to {file_path}")
 
     def download_album(self, album_id: str) -> dict:
@@ -217,13 +222,8 @@ class ScraperImgur:
                     album_id,
                     e,
                 )
-        # Keep only image IDs, as their other data is stored separately.
-        album_data["images"] = [image["id"] for image in album_data["images"]]
-        data_path = pathlib.Path(f"{self._path}\\album_data\\{album_id}.json")
-        data_path.parent.mkdir(parents=True, exist_ok=True)
-        with data_path.open("w", encoding="utf8") as f:
-            f.write(json.dumps(album_data))
-        print(f"Album complete, data downloaded to {data_path}.")
+        self._data.add_album(album_data)
+        print(f"Album {album_id} complete.")
 
     def download_gallery(self, gallery_id: str) -> dict:
         """Download album data from imgur given its id."""
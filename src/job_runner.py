@@ -0,0 +1,412 @@
+"""Run the comment and imgur jobs of every collection the same way.
+
+A collection (discussions, rewatches, writing) is defined by its database,
+its output path, and the queries selecting the posts to work on.
+Jobs are run in batches, each post in its own transaction,
+and their progress is printed and logged as they go."""
+
+import os
+import time
+import logging
+import pathlib
+import itertools
+import concurrent.futures
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator
+from logging.handlers import TimedRotatingFileHandler
+from database import Database, DatabaseDiscussion, DatabaseRewatch, DatabaseWriting
+from scraper_comment_tree import CommentTreeScraper
+from imgur_parser import ImgurParser, dump_data
+from imgur_scraper import ScraperImgur
+from imgur_data import import_data
+from compression import (
+    DICTIONARY_EXTENSION,
+    GZIP,
+    load_dictionary,
+    train_dictionary,
+)
+
+IMGUR_QUERY = "src\\queries\\add_imgur_links.sql"
+
+# Submissions prefetched per request, the maximum allowed by Reddit
+BATCH_SIZE = 100
+# Processes parsing the JSON dumps for imgur links
+PARSE_WORKERS = os.cpu_count()
+# JSON dumps the zstd dictionary is trained on
+DICTIONARY_SAMPLES = 1000
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Collection:
+    """The definition of a collection of posts.
+
+    ``work_query`` selects the post_id and title of the unprocessed posts,
+    and ``done_query`` marks a post as processed given its post_id.
+    ``skip_query`` marks a post that cannot be found or was deleted as skipped,
+    so that it is not tried again, and ``refresh_query`` selects the post_id
+    and title of the posts already scraped.
+    ``group_query``, if any, marks as processed the groups (e.g. series)
+    whose posts are all processed.
+    If ``packed``, the JSON dumps are saved in a pack
+    instead of a file per post.
+    ``compression`` (gzip, zstd, or None) is the one of the new JSON dumps."""
+
+    name: str
+    db_class: type[Database]
+    db_path: str
+    base_path: str
+    work_query: str
+    done_query: str
+    refresh_query: str
+    skip_query: str
+    group_query: str = None
+    packed: bool = True
+    compression: str = GZIP
+
+    @property
+    def json_path(self) -> str:
+        """Return the path of the JSON dumps."""
+        return f"{self.base_path}\\json"
+
+    def open_db(self) -> Database:
+        """Open the database of the collection."""
+        return self.db_class(path=self.db_path)
+
+
+COLLECTIONS = {
+    "discussion": Collection(
+        name="discussion",
+        db_class=DatabaseDiscussion,
+        db_path="data\\discussion.sqlite",
+        base_path="data\\discussion_data",
+        work_query=(
+            "SELECT episode.post_id, episode.title FROM episode "
+            "JOIN discussion ON episode.id = discussion.id "
+            "WHERE discussion.processed = 0 AND episode.processed = 0 "
+            "ORDER BY episode.id"
+        ),
+        done_query="UPDATE episode SET processed = 1 WHERE post_id = ?",
+        refresh_query=(
+            "SELECT post_id, title FROM episode WHERE processed = 1 ORDER BY id"
+        ),
+        skip_query="UPDATE episode SET processed = 2 WHERE post_id = ?",
+        group_query=(
+            "UPDATE discussion SET processed = 1 WHERE processed = 0 AND NOT EXISTS "
+            "(SELECT 1 FROM episode WHERE episode.id = discussion.id "
+            "AND episode.processed = 0)"
+        ),
+    ),
+    "rewatch": Collection(
+        name="rewatch",
+        db_class=DatabaseRewatch,
+        db_path="data\\rewatches.sqlite",
+        base_path="data\\rewatch_data",
+        work_query=(
+            "SELECT episode.post_id, episode.title FROM episode "
+            "JOIN rewatch ON episode.id = rewatch.id "
+            "WHERE rewatch.processed = 0 AND episode.processed = 0 "
+            "ORDER BY episode.id"
+        ),
+        done_query="UPDATE episode SET processed = 1 WHERE post_id = ?",
+        refresh_query=(
+            "SELECT post_id, title FROM episode WHERE processed = 1 ORDER BY id"
+        ),
+        skip_query="UPDATE episode SET processed = 2 WHERE post_id = ?",
+        group_query=(
+            "UPDATE rewatch SET processed = 1 WHERE processed = 0 AND NOT EXISTS "
+            "(SELECT 1 FROM episode WHERE episode.id = rewatch.id "
+            "AND episode.processed = 0)"
+        ),
+    ),
+    "writing": Collection(
+        name="writing",
+        db_class=DatabaseWriting,
+        db_path="data\\writing.sqlite",
+        base_path="data\\writing_data",
+        work_query="SELECT post_id, title FROM writing WHERE processed = 0 ORDER BY id",
+        done_query="UPDATE writing SET processed = 1 WHERE post_id = ?",
+        refresh_query="SELECT post_id, title FROM writing WHERE processed = 1",
+        skip_query="UPDATE writing SET processed = 2 WHERE post_id = ?",
+    ),
+}
+
+
+class Progress:
+    """Count the processed and failed items of a job, and report them."""
+
+    def __init__(self, name: str, total: int) -> None:
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self._start = time.perf_counter()
+
+    def update(
+        self, description: str, failed: bool = False, skipped: bool = False
+    ) -> None:
+        """Count one more item, and report the progress."""
+        self.done += 1
+        self.failed += failed
+        self.skipped += skipped
+        elapsed = time.perf_counter() - self._start
+        remaining = elapsed / self.done * (self.total - self.done)
+        status = "failed" if failed else "skipped" if skipped else "done"
+        print(
+            f"[{self.name}] {self.done}/{self.total} {description} {status} "
+            f"({elapsed:.0f}s elapsed, ~{remaining:.0f}s left)"
+        )
+        logger.info(
+            "[%s] %s/%s %s %s", self.name, self.done, self.total, description, status
+        )
+
+    def summary(self) -> str:
+        """Return a summary of the job."""
+        elapsed = time.perf_counter() - self._start
+        return (
+            f"[{self.name}] {self.done - self.failed - self.skipped}/{self.total} "
+            f"done, {self.skipped} skipped, {self.failed} failed in {elapsed:.0f}s"
+        )
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    """Yield lists of up to ``size`` consecutive items."""
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+class JobRunner:
+    """Run the jobs of a collection."""
+
+    def __init__(
+        self, collection: Collection, db: Database = None, batch_size: int = BATCH_SIZE
+    ) -> None:
+        """Initialise from a collection, opening its database if none is given."""
+        self._collection = collection
+        self._db = db if db is not None else collection.open_db()
+        self._batch_size = batch_size
+
+    def run_job(
+        self,
+        progress: Progress,
+        description: str,
+        job: Callable[[], None],
+        done_params: tuple = None,
+    ) -> bool:
+        """Run a job in its own transaction and return whether it succeeded.
+
+        If ``done_params`` are given, the collection ``done_query`` is executed
+        with them in the same transaction."""
+        self._db.begin()
+        try:
+            job()
+            if done_params is not None:
+                self._db.q.execute(self._collection.done_query, done_params)
+            self._db.commit()
+        except Exception as e:
+            print(f"Exception: {e}")
+            logger.error(
+                "An exception has occurred while processing %s: %s", description, e
+            )
+            self._db.rollback()
+            progress.update(description, failed=True)
+            return False
+        progress.update(description)
+        return True
+
+    def scrape_comments(self, config_name: str, **settings) -> Progress:
+        """Scrape the comment trees of the unprocessed posts.
+
+        Submissions are prefetched in batches, and posts that cannot be found
+        or were deleted are marked as skipped, and not tried again.
+        Groups are processed once their posts are all processed or skipped."""
+        self._db.migrate()
+        scraper = CommentTreeScraper(
+            config_name=config_name,
+            db=self._db,
+            compression=self._collection.compression,
+            **settings,
+        )
+        posts = {
+            post["post_id"]: post["title"]
+            for post in self._db.q.execute(self._collection.work_query).fetchall()
+        }
+        progress = Progress(f"{self._collection.name} comments", len(posts))
+        logger.info("%s posts to process found", len(posts))
+        for batch in batched(posts, self._batch_size):
+            try:
+                prefetched = scraper.prefetch_submissions(batch)
+            except Exception as e:
+                print(f"Exception: {e}")
+                logger.error("An exception has occurred while prefetching: %s", e)
+                for post_id in batch:
+                    progress.update(f"post {post_id}", failed=True)
+                continue
+            for post_id in batch:
+                if post_id not in prefetched:
+                    logger.warning(
+                        "Submission %s (%s) not found or deleted, skipped",
+                        post_id,
+                        posts[post_id],
+                    )
+                    self._db.q.execute(self._collection.skip_query, (post_id,))
+                    progress.update(f"post {post_id}", skipped=True)
+            for post_id, submission in prefetched.items():
+                self.run_job(
+                    progress,
+                    f"post {post_id} ({posts[post_id]})",
+                    lambda post_id=post_id, submission=submission: (
+                        scraper.scrape_submission(
+                            post_id,
+                            path=self._collection.base_path,
+                            json_lines=True,
+                            prefetched=submission,
+                            packed=self._collection.packed,
+                        )
+                    ),
+                    done_params=(post_id,),
+                )
+            self.mark_groups()
+        print(progress.summary())
+        logger.info(progress.summary())
+        return progress
+
+    def mark_groups(self) -> None:
+        """Mark as processed the groups whose posts are all processed or skipped."""
+        if self._collection.group_query:
+            self._db.q.execute(self._collection.group_query)
+
+    def refresh_comments(self, config_name: str, **settings) -> Progress:
+        """Update the comment trees of the processed posts."""
+        scraper = CommentTreeScraper(
+            config_name=config_name,
+            db=self._db,
+            compression=self._collection.compression,
+            **settings,
+        )
+        posts = self._db.q.execute(self._collection.refresh_query).fetchall()
+        progress = Progress(f"{self._collection.name} refresh", len(posts))
+        logger.info("%s posts to refresh found", len(posts))
+
+        def refresh(post_id: str) -> None:
+            scraper.refresh_submission(post_id, path=self._collection.base_path)
+            scraper.dump_all(
+                path=self._collection.base_path,
+                json_lines=True,
+                packed=self._collection.packed,
+            )
+
+        for post in posts:
+            self.run_job(
+                progress,
+                f"post {post['post_id']} ({post['title']})",
+                lambda post_id=post["post_id"]: refresh(post_id),
+            )
+        print(progress.summary())
+        logger.info(progress.summary())
+        return progress
+
+    def parse_links(self, workers: int = PARSE_WORKERS) -> None:
+        """Find the image links in the JSON dumps and save them in the db.
+
+        Links of the other image hosts are saved along with them.
+        The dumps are parsed by the given number of processes."""
+        self._db.migrate()
+        ImgurParser(path=self._collection.json_path, db=self._db).process(
+            query_path=IMGUR_QUERY, workers=workers
+        )
+
+    def train_dictionary(self, samples: int = DICTIONARY_SAMPLES) -> None:
+        """Train the zstd dictionary of the JSON dumps on the first of them.
+
+        An existing dictionary is kept, as the dumps compressed with it
+        could not be read anymore without it."""
+        file_path = pathlib.Path(f"{self._collection.json_path}{DICTIONARY_EXTENSION}")
+        if file_path.is_file():
+            logger.info("The dictionary %s already exists", file_path)
+            return
+        data = list(itertools.islice(dump_data(self._collection.json_path), samples))
+        file_path.write_bytes(train_dictionary(data))
+        load_dictionary.cache_clear()
+        logger.info("Dictionary trained on %s dumps saved to %s", len(data), file_path)
+
+    def scrape_links(self, config_ids: Iterable[int] = (0,)) -> None:
+        """Download the imgur links found, with each of the given app credentials.
+
+        The next credentials are used when the current ones are rate limited,
+        until there are no more in the configuration."""
+        for config_id in config_ids:
+            logger.info("-" * 60)
+            logger.info("Connecting with app credentials #%s", config_id)
+            try:
+                scraper = ScraperImgur(
+                    path=self._collection.base_path, db=self._db, config_id=config_id
+                )
+            except KeyError:
+                logger.info("No app credentials #%s found", config_id)
+                return
+            scraper.scrape()
+
+    def import_imgur_data(self) -> None:
+        """Import the image and album data saved as files into the db."""
+        import_data(path=self._collection.base_path, db=self._db)
+
+
+def run_collection(name: str, job: str, kwargs: dict) -> None:
+    """Run a job of the named collection."""
+    getattr(JobRunner(COLLECTIONS[name]), job)(**kwargs)
+
+
+def run_collections(names: Iterable[str], job: str, workers: int = 1, **kwargs) -> None:
+    """Run the same job for each of the named collections.
+
+    With more than one worker, collections are run in parallel processes,
+    each with its own database.
+    Jobs using the same API credentials share their rate limit,
+    so give each process its own credentials where that matters."""
+    if workers == 1:
+        for name in names:
+            run_collection(name, job, kwargs)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(run_collection, name, job, kwargs): name for name in names
+        }
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Exception: {e}")
+                logger.error(
+                    "An exception has occurred while running %s for %s: %s",
+                    job,
+                    futures[future],
+                    e,
+                )
+
+
+def setup_logging(file_name: str, level: int = logging.INFO) -> None:
+    """Log to a daily rotated file in the logs folder."""
+    os.makedirs("logs", exist_ok=True)
+    logging.basicConfig(
+        handlers=[
+            TimedRotatingFileHandler(
+                filename=f"logs\\{file_name}",
+                when="midnight",
+                backupCount=7,
+                encoding="utf8",
+            )
+        ],
+        format="%(asctime)s | %(name)s | %(levelname)s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        level=level,
+    )
+
+
+if __name__ == "__main__":
+    setup_logging("db.log")
+    run_collections(COLLECTIONS, "scrape_comments", config_name="CommentTreeScraper")
+    logging.info("-" * 60)
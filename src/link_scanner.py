@@ -0,0 +1,59 @@
+"""Finding the links of the image hosts at risk of losing their contents.
+
+Very few texts have links at all, so a text is first scanned for the
+domains of all hosts at once, with a single alternation of literals.
+Only the patterns of the hosts found are then run on it."""
+
+import re
+from dataclasses import dataclass
+from typing import Iterable
+
+IMGUR = re.compile(
+    r"((?:https?:\/\/)?(?:i\.|m\.|www\.)?(?:stack\.)?imgur\.com\/(?:a\/|gallery\/)?[a-zA-Z0-9]{4,}(?:\.\w+)?)"
+)
+REDDIT = re.compile(r"((?:https?:\/\/)?i\.redd\.it\/[a-zA-Z0-9]+\.\w+)")
+GFYCAT = re.compile(
+    r"((?:https?:\/\/)?(?:www\.|thumbs\.|giant\.|zippy\.|fat\.)?gfycat\.com\/"
+    r"(?:gifs\/detail\/|ifr\/)?[a-zA-Z]{4,}(?:[-.]\w+)?)"
+)
+TINYPIC = re.compile(
+    r"((?:https?:\/\/)?(?:i\d*\.|oi\d*\.|www\.)?tinypic\.com\/"
+    r"(?:view\.php\?pic=[a-zA-Z0-9]+&s=\d+|r\/[a-zA-Z0-9]+\/\d+|[a-zA-Z0-9]+\.\w+))"
+)
+
+
+@dataclass(frozen=True)
+class Host:
+    """An image host, with a literal part of all its links, and their pattern."""
+
+    name: str
+    domain: str
+    pattern: re.Pattern
+
+
+HOSTS = (
+    Host("imgur", "imgur.com", IMGUR),
+    Host("reddit", "i.redd.it", REDDIT),
+    Host("gfycat", "gfycat.com", GFYCAT),
+    Host("tinypic", "tinypic.com", TINYPIC),
+)
+
+
+class LinkScanner:
+    """Find the links of the given hosts in one pass over texts without any."""
+
+    def __init__(self, hosts: Iterable[Host] = HOSTS) -> None:
+        self._hosts = {host.domain: host for host in hosts}
+        self._prefilter = re.compile("|".join(map(re.escape, self._hosts)))
+
+    def scan(self, text: str) -> set[tuple[str, str]]:
+        """Return the unique (host name, link) pairs in the text."""
+        domains = set(self._prefilter.findall(text))
+        return {
+            (self._hosts[domain].name, link)
+            for domain in domains
+            for link in self._hosts[domain].pattern.findall(text)
+        }
+
+
+SCANNER = LinkScanner()
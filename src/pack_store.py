@@ -0,0 +1,224 @@
+"""Append-only container of many small records, with a sidecar index.
+
+A pack is a single file of records, each made of a header line with its id
+and length, followed by its data and a newline.
+The index next to it has one line per record with its id, offset, and length,
+so that any record is read with a single seek.
+Records are never overwritten: writing an id again appends a new record,
+which replaces the previous one in the index.
+Both files are only appended to, the pack first, so the index never points
+to missing data; an index behind its pack (e.g. after a crash) is completed
+from the record headers, and a record left partial is cut off.
+Readers open packs read-only, so that they never change them: a record
+being written is then ignored instead of cut off."""
+
+import io
+import os
+import shutil
+import pathlib
+from typing import BinaryIO, Iterator
+
+PACK_EXTENSION = ".pack"
+INDEX_EXTENSION = ".idx"
+
+
+def read_record(file_path: str, offset: int, length: int) -> bytes:
+    """Return the data of the record at the given position of a pack."""
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+class RecordReader(io.RawIOBase):
+    """A binary file over the data of a record of a pack, with its own handle."""
+
+    def __init__(self, file_path: str, offset: int, length: int) -> None:
+        self._file = open(file_path, "rb")
+        self._file.seek(offset)
+        self._remaining = length
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: bytearray) -> int:
+        size = min(len(buffer), self._remaining)
+        if size == 0:
+            return 0
+        read = self._file.readinto(memoryview(buffer)[:size])
+        self._remaining -= read
+        return read
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+def open_record(file_path: str, offset: int, length: int) -> BinaryIO:
+    """Open the record at the given position of a pack, to be read in chunks."""
+    return io.BufferedReader(RecordReader(file_path, offset, length))
+
+
+class PackStore:
+    """A pack and its index, for random access by id and sequential streaming.
+
+    Only one process may write to a pack at a time; others open it read-only."""
+
+    def __init__(self, file_path: str, read_only: bool = False) -> None:
+        """Open the pack at the given path, creating it on the first write.
+
+        A read-only pack is never written to, nor recovered."""
+        self._read_only = read_only
+        self._pack_path = pathlib.Path(file_path)
+        self._index_path = self._pack_path.with_suffix(INDEX_EXTENSION)
+        self._index: dict[str, tuple[int, int]] = {}
+        self._pack = None
+        self._index_file = None
+        self._reader = None
+        if self._pack_path.is_file():
+            self.load_index()
+
+    def __enter__(self) -> "PackStore":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, record_id: str) -> bool:
+        return record_id in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __getitem__(self, record_id: str) -> bytes:
+        offset, length = self._index[record_id]
+        if self._reader is None:
+            self._reader = self._pack_path.open("rb")
+        self._reader.seek(offset)
+        return self._reader.read(length)
+
+    @property
+    def path(self) -> pathlib.PurePath:
+        """Return the path of the pack."""
+        return self._pack_path
+
+    def locations(self) -> dict[str, tuple[int, int]]:
+        """Return the offset and length of each record, by id."""
+        return dict(self._index)
+
+    def load_index(self) -> None:
+        """Read the index, and complete it from the pack if it is behind.
+
+        A read-only pack is only completed in memory."""
+        end = 0
+        if self._index_path.is_file():
+            with self._index_path.open("r+b" if not self._read_only else "rb") as f:
+                lines = f.read().split(b"\n")
+                # The last line is partial while being written, or after a crash
+                if lines[-1] and not self._read_only:
+                    f.truncate(f.tell() - len(lines[-1]))
+            for line in lines[:-1]:
+                record_id, offset, length = line.decode("utf8").split("\t")
+                self._index[record_id] = (int(offset), int(length))
+                end = max(end, int(offset) + int(length) + 1)
+        size = self._pack_path.stat().st_size
+        if end > size:
+            # The pack lost records the index points to: rebuild the index
+            self._index = {}
+            if not self._read_only:
+                self._index_path.unlink(missing_ok=True)
+            end = 0
+        if end < size:
+            if self._read_only:
+                missing, _ = self.scan(end)
+                for record_id, offset, length in missing:
+                    self._index[record_id] = (offset, length)
+            else:
+                self.recover(end)
+
+    def scan(self, start: int) -> tuple[list[tuple[str, int, int]], int]:
+        """Return the id, offset, and length of the records from the given offset on.
+
+        The end of the last whole record is returned with them."""
+        records = []
+        with self._pack_path.open("rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            f.seek(start)
+            end = start
+            while header := f.readline():
+                try:
+                    record_id, length = header.decode("utf8").rstrip("\n").split("\t")
+                    offset = end + len(header)
+                    length = int(length)
+                except ValueError:
+                    break
+                if offset + length + 1 > size:
+                    break
+                f.seek(offset + length + 1)
+                records.append((record_id, offset, length))
+                end = offset + length + 1
+        return records, end
+
+    def recover(self, start: int) -> None:
+        """Index the records of the pack from the given offset on.
+
+        A partial record at the end of the pack is removed."""
+        missing, end = self.scan(start)
+        with self._pack_path.open("r+b") as f:
+            f.truncate(end)
+        with self._index_path.open("a", encoding="utf8") as f:
+            for record_id, offset, length in missing:
+                f.write(f"{record_id}\t{offset}\t{length}\n")
+                self._index[record_id] = (offset, length)
+
+    def put(self, record_id: str, data: bytes | BinaryIO) -> None:
+        """Append a record, replacing any previous record of the same id.
+
+        The data is given as bytes, or as a binary file, copied from its start."""
+        if self._read_only:
+            raise ValueError(f"The pack {self._pack_path} is read-only")
+        if "\t" in record_id or "\n" in record_id:
+            raise ValueError(f"Invalid record id: {record_id!r}")
+        if self._pack is None:
+            self._pack_path.parent.mkdir(parents=True, exist_ok=True)
+            self._pack = self._pack_path.open("ab")
+            self._index_file = self._index_path.open("a", encoding="utf8")
+        if isinstance(data, bytes):
+            length = len(data)
+        else:
+            length = data.seek(0, os.SEEK_END)
+            data.seek(0)
+        header = f"{record_id}\t{length}\n".encode("utf8")
+        offset = self._pack.tell() + len(header)
+        self._pack.write(header)
+        if isinstance(data, bytes):
+            self._pack.write(data)
+        else:
+            shutil.copyfileobj(data, self._pack)
+        self._pack.write(b"\n")
+        self._pack.flush()
+        self._index_file.write(f"{record_id}\t{offset}\t{length}\n")
+        self._index_file.flush()
+        self._index[record_id] = (offset, length)
+
+    def records(self) -> Iterator[tuple[str, bytes]]:
+        """Yield the id and data of the current records, in the order of the pack.
+
+        Records replaced by a later one are skipped."""
+        if not self._index:
+            return
+        with self._pack_path.open("rb") as f:
+            for record_id, (offset, length) in sorted(
+                self._index.items(), key=lambda item: item[1]
+            ):
+                f.seek(offset)
+                yield record_id, f.read(length)
+
+    def close(self) -> None:
+        """Close the files of the pack."""
+        for f in (self._pack, self._index_file, self._reader):
+            if f is not None:
+                f.close()
+        self._pack = self._index_file = self._reader = None
@@ -1,14 +1,16 @@
 """General wiki parser."""
 
-import re
 import abc
-from functools import reduce
-from operator import ior
+import json
+import hashlib
+import pathlib
+import collections
+import concurrent.futures
+from functools import partial
 from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator
 from database import Database
-
-TABLE_LINK_AND_TEXT = re.compile(r"\[([^\|]*)\]\(\/(?:comments\/)?([^\|]+)\)")
-TABLE_LINK = re.compile(r"\[[^\|]*\]\(\/(?:comments\/)?([^\|]+)\)")
+from table_tokenizer import RELATIVE_LINK, first_target
 
 
 @dataclass
@@ -21,6 +23,9 @@ class Rewatch:
     hosts: str = None
     year: int = None
     table: list[str] = field(default_factory=list)
+    episodes: dict = field(default_factory=dict)
+    section: tuple[str, str] = None
+    section_hash: str = None
 
     def reset_table(self) -> None:
         """Reset the table properties.
@@ -49,6 +54,8 @@ class Discussion:
     year: int = None
     notes: str = None
     episodes: dict = field(default_factory=dict)
+    section: tuple[str, str] = None
+    section_hash: str = None
 
     @property
     def info(self) -> tuple[str]:
@@ -57,19 +64,19 @@ class Discussion:
 
 
 class TableParser:
-    """Parse a variety of markdown tables used in the rewatch archive."""
+    """Parse a variety of markdown tables used in the rewatch archive.
+
+    Links to episodes are relative to the subreddit, as in ``/id``."""
 
     @staticmethod
     def parse_table_no_headers(table: list[str]) -> dict:
         """Parse a table that has no headers."""
-        return reduce(
-            ior,
-            list(
-                dict(pair)
-                for row in table
-                if (pair := TABLE_LINK_AND_TEXT.findall(row))
-            ),
-        )
+        return {
+            text: target
+            for row in table
+            for text, target in RELATIVE_LINK.findall(row)
+            if target
+        }
 
     @staticmethod
     def parse_table_alternate_headers(table: list[str]) -> dict:
@@ -77,8 +84,8 @@ class TableParser:
         data = {}
         for header, contents in zip(table[::2], table[1::2]):
             titles = list(filter(None, header.split("|")))
-            links = [TABLE_LINK.search(field) for field in contents.split("|") if field]
-            data.update(dict(zip(titles, [x[1] if x else None for x in links])))
+            links = [first_target(field) for field in contents.split("|") if field]
+            data.update(zip(titles, links))
         return data
 
     @staticmethod
@@ -86,10 +93,9 @@ class TableParser:
         """Parse a table that has a single header, and alternating name/link."""
         data = {}
         for row in table[1:]:
-            row = list(filter(None, row.split("|")))
-            for title, link in zip(row[::2], row[1::2]):
-                link = TABLE_LINK.findall(link)
-                data[title] = link[0] if link else None
+            cells = list(filter(None, row.split("|")))
+            for title, link in zip(cells[::2], cells[1::2]):
+                data[title] = first_target(link)
         return data
 
     @staticmethod
@@ -97,11 +103,9 @@ class TableParser:
         """Parse a table that has a single header, and link in the rightmost column."""
         data = {}
         for row in table[1:]:
-            row = list(filter(None, row.split("|")))
-            titles, link = row[:-1], row[-1]
-            title = " - ".join(title for title in titles)
-            link = TABLE_LINK.findall(link)
-            data[title] = link[0] if link else None
+            cells = list(filter(None, row.split("|")))
+            title = " - ".join(cells[:-1])
+            data[title] = first_target(cells[-1])
         return data
 
     @staticmethod
@@ -113,20 +117,51 @@ class TableParser:
         return TableParser.parse_table_no_headers(true_table)
 
 
+def read_lines(file_path: str) -> Iterator[str]:
+    """Yield the lines of a file without trailing whitespace, skipping empty ones."""
+    with open(file_path, encoding="utf-8") as f:
+        for line in f:
+            if line := line.rstrip():
+                yield line
+
+
+def file_year(name: str) -> int:
+    """Return the year a file is named after, if any."""
+    try:
+        return int(name)
+    except ValueError:
+        return None
+
+
 class Parser(abc.ABC):
-    """Parser for wiki pages."""
+    """Parser for wiki pages.
+
+    The file is read one line at a time, the current line being kept
+    as a lookahead, so that files of any size are parsed in constant memory.
+    The lines read since the start of a section are hashed along the way."""
+
+    def __init__(self, file_path: str, db: Database = None) -> None:
+        """Initialise the parser of a file.
 
-    def __init__(self, file_path: str, db: Database) -> None:
+        The db is only needed to add the entries with ``parse_file``."""
         self._file_path = file_path
-        with open(file_path, encoding="utf-8") as f:
-            # Strip \n and ignore empty lines
-            self._contents = list(filter(None, (line.rstrip() for line in f)))
-        self._idx = 0
+        self._name = pathlib.Path(file_path).stem
+        self._year = file_year(self._name)
+        self._lines = read_lines(file_path)
+        self._current: str = None
         self._db = db
+        self._section_hash = None
+        self._section_titles = collections.Counter()
+        self.next_line()
 
     @abc.abstractmethod
+    def entries(self) -> Iterator[Any]:
+        """Parse the contents and yield the entries found."""
+
     def parse_file(self) -> None:
-        """Parse the contents."""
+        """Parse the contents and add the entries to the db."""
+        self._db.migrate()
+        self.create_entries(self._db, self.entries())
 
     @abc.abstractmethod
     def parse_entry(self) -> None:
@@ -141,43 +176,118 @@ class Parser(abc.ABC):
             self.next_line()
         return table
 
-    @staticmethod
     @abc.abstractmethod
-    def parse_table(
-        table: list[str], rewatch_name: str = None, year: int = None
-    ) -> dict:
+    def parse_table(self, table: list[str], entry_name: str = None) -> dict:
         """Extract information from the table given in markdown format."""
 
     @staticmethod
     def remove_formatting(text: str) -> str:
         """Remove bold formatting from markdown code."""
         ans = text.strip()
-        while ans.count("*") > 1:
-            ans = ans.replace("*", "", 2)
-        while ans.startswith("#"):
-            ans = ans[1:]
-        ans = ans.strip()
-        return ans
+        stars = ans.count("*")
+        if stars > 1:
+            # Asterisks are removed in pairs, an odd one out is the last one
+            last = ans.rindex("*") if stars % 2 else len(ans)
+            ans = ans[:last].replace("*", "") + ans[last:]
+        return ans.lstrip("#").strip()
 
+    @staticmethod
     @abc.abstractmethod
-    def create_entry(self) -> None:
-        """Create a db entry."""
+    def create_entries(db: Database, entries: Iterable[Any]) -> None:
+        """Add the given entries to the db."""
 
     @property
-    def current_line(self) -> str:
-        """Return the current line being parsed."""
-        return self._contents[self._idx]
+    def name(self) -> str:
+        """Return the file name."""
+        return self._name
+
+    @property
+    def year(self) -> int:
+        """Return the year included in the file name."""
+        return self._year
 
     @property
-    def num_lines(self) -> int:
-        """Return the number of total lines of contents."""
-        return len(self._contents)
+    def current_line(self) -> str:
+        """Return the current line being parsed, or an empty string past the end."""
+        return self._current if self._current is not None else ""
 
     @property
     def out_of_bounds(self) -> bool:
         """Check if the file is over."""
-        return self._idx >= self.num_lines
+        return self._current is None
 
     def next_line(self) -> None:
-        """Advance the line counter."""
-        self._idx += 1
+        """Read the next line."""
+        if self._section_hash is not None and self._current is not None:
+            self._section_hash.update(f"{self._current}\n".encode("utf8"))
+        self._current = next(self._lines, None)
+
+    def start_section(self, title: str, overrides: dict = None) -> tuple[str, str]:
+        """Start hashing a section from the current line, and return its key.
+
+        The key is the file name, and the title followed by its number of
+        occurrences so far, to tell apart sections with the same title.
+        The manual overrides of the page, if any, are part of the hash,
+        so that sections are parsed again when they change."""
+        self._section_hash = hashlib.sha256()
+        if overrides:
+            self._section_hash.update(
+                json.dumps(overrides, sort_keys=True).encode("utf8")
+            )
+        self._section_titles[title] += 1
+        return (self.name, f"{title} #{self._section_titles[title]}")
+
+    def section_hash(self) -> str:
+        """Return the hash of the lines read since the start of the section."""
+        return self._section_hash.hexdigest()
+
+    def remaining_lines(self) -> Iterator[str]:
+        """Yield the current line and all the following ones."""
+        while not self.out_of_bounds:
+            yield self.current_line
+            self.next_line()
+
+
+def section_hashes(db: Database) -> dict[tuple[str, str], str]:
+    """Return the content hash of each wiki section in the db."""
+    return {
+        (entry["file_name"], entry["section"]): entry["content_hash"]
+        for entry in db.q.execute(
+            "SELECT file_name, section, content_hash FROM wiki_section"
+        ).fetchall()
+    }
+
+
+def save_section_hash(
+    db: Database, section: tuple[str, str], content_hash: str
+) -> None:
+    """Save the content hash of a wiki section."""
+    db.q.execute(
+        "INSERT INTO wiki_section (file_name, section, content_hash) "
+        "VALUES (?, ?, ?) ON CONFLICT (file_name, section) "
+        "DO UPDATE SET content_hash = excluded.content_hash",
+        (*section, content_hash),
+    )
+
+
+def parse_entries(parser_class: type[Parser], file_path: str) -> list[Any]:
+    """Parse a file and return its entries."""
+    return list(parser_class(file_path).entries())
+
+
+def parse_files(
+    parser_class: type[Parser],
+    file_paths: list[str],
+    db: Database,
+    workers: int = None,
+) -> None:
+    """Parse the files in parallel and add their entries to the db.
+
+    Files are parsed in worker processes, while the entries are added
+    by this process only, in the order of the files."""
+    db.migrate()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(partial(parse_entries, parser_class), file_paths)
+        for file_path, entries in zip(file_paths, results):
+            print(f"Processing {file_path}")
+            parser_class.create_entries(db, entries)
@@ -1,52 +1,54 @@
 """Parse the discussion wiki and archive the data in the database."""
 
-import re
-import pathlib
-from operator import ior
-from functools import reduce
 from string import punctuation
-from database import DatabaseDiscussion
-from parser_wiki import Parser, Discussion
+from typing import Iterable, Iterator
+from database import Database, DatabaseDiscussion
+from table_formats import FormatRegistry, TableFormat
+from parser_wiki import (
+    Parser,
+    Discussion,
+    parse_files,
+    section_hashes,
+    save_section_hash,
+)
+from table_tokenizer import PERMALINK, TITLED_LINK, POST_LINK
 
 DISCUSSION_ENTRY_PATH = "src\\queries\\discussion\\add_discussion_entry.sql"
 EPISODE_ENTRY_PATH = "src\\queries\\add_episodes.sql"
 
 FILE_PATH = "data\\wiki\\anime\\discussion_archive_edited"
 
-PERMALINK_AND_TEXT = re.compile(
-    r"(?:\|([^\|]*)\|\[[^\]]*\]\(https?:\/\/redd\.it\/(\w+)(?:\)|$)"
-    r"|\[([^\]]*)\]\([^\s]*comments\/(\w+)[^\)]*(?:\)|$)"
-    r"|\[([^\]]*)\]\(\/(\w+)(?:\)|$))"
-)
-HEADERS = re.compile(r"\|?([^\|]+)\|?")
-CONTENTS_LINKS = re.compile(
-    r"\[[^\]]+\]\([^|]*(?:comments|redd\.it)?\/(\w+)[^\)]*(?:\)|$)"
-)
-LONG_RUNNING_PARSE = re.compile(r"\[([^\]]+)\]\([^\)]*\/(\w+)\/?\)")
-
 
 # Compare with parser_wiki.TableParser to see which one to keep/improve.
 class TableDiscussionParser:
     """Parse discussion wiki tables."""
 
+    @staticmethod
+    def permalinks(row: str, titled: bool = False) -> list[tuple[str, str]]:
+        """Return the title and post id of each link to a post in a row.
+
+        A redd.it link starting a cell is titled by the previous cell,
+        if that one is text only. Other links to a post are titled by their text.
+        With ``titled``, only the former are returned."""
+        if titled:
+            return TITLED_LINK.findall(row)
+        return [
+            (title, titled_id) if title else (text, post)
+            for title, titled_id, text, comments_id, short_id, relative_id in (
+                PERMALINK.findall(row)
+            )
+            if title or (post := comments_id or short_id or relative_id)
+        ]
+
     @staticmethod
     def parse_table_one_header(table: list[str]) -> dict:
         """Parse a table that has a single header row.
 
-        Contents can be in the form:
-        - name | [text](link) (| repeat)
-        - [name](link) (| repeat)"""
-        return reduce(
-            ior,
-            list(
-                {
-                    entry[1]: entry[0]
-                    for entry in PERMALINK_AND_TEXT.findall(row)
-                    if entry[1]
-                }
-                for row in table[1:]
-            ),
-        )
+        Contents have the form:
+        - name | [text](link) (| repeat)"""
+        return {
+            post: title for row in table[1:] for title, post in TITLED_LINK.findall(row)
+        }
 
     @staticmethod
     def parse_table_alternate_headers(table: list[str]) -> dict:
@@ -56,12 +58,12 @@ class TableDiscussionParser:
         - name (| repeat)
           [text](link) (| repeat)"""
         ans = {}
-        for pair in zip(table[::2], table[1::2]):
-            header_row, link_row = pair
-            for title, contents in zip(header_row.split("|"), link_row.split("|")):
-                links = CONTENTS_LINKS.findall(contents)
-                if links and links[0]:
-                    ans[links[0]] = title
+        for header_row, link_row in zip(table[::2], table[1::2]):
+            for title, cell in zip(header_row.split("|"), link_row.split("|")):
+                for text, comments_id, last_id in POST_LINK.findall(cell):
+                    if text and (post := comments_id or last_id):
+                        ans[post] = title
+                        break
         return ans
 
     @staticmethod
@@ -70,48 +72,65 @@ class TableDiscussionParser:
 
         Contents have the form:
         - [text](link) (| repeat)"""
-        return reduce(
-            ior,
-            list(
-                {
-                    entry[1]: entry[0]
-                    for entry in LONG_RUNNING_PARSE.findall(row)
-                    if entry[1]
-                }
-                for row in table
-            ),
-        )
+        return {
+            comments_id or last_id: text
+            for row in table
+            for text, comments_id, last_id in POST_LINK.findall(row)
+            if text and (comments_id or last_id)
+        }
+
+
+TABLE_FORMATS = FormatRegistry(
+    "discussion",
+    [
+        TableFormat(
+            "alternate headers",
+            TableDiscussionParser.parse_table_alternate_headers,
+            header=r"[\W_]*Ep\.",
+        ),
+        TableFormat(
+            "no headers", TableDiscussionParser.parse_table_no_headers, rows=("all",)
+        ),
+        TableFormat("one header", TableDiscussionParser.parse_table_one_header),
+    ],
+    delimiters=("###", "* ", "**"),
+)
 
 
 class ParserDiscussion(Parser):
     """Parser for episode discussion wiki pages."""
 
-    def parse_file(self) -> None:
-        """Parse the contents."""
-        if self.year in {2011, 2012, 2013, 2014, 2015, 2016}:
-            self.parse_file_1(delimiter="* ")
-        elif self.year in {2017, 2018, 2019, 2021, 2022}:
-            self.parse_file_1(delimiter="**")
-        elif self.year in {2020}:
-            self.parse_file_1(delimiter="###")
-        elif self.name == "long_running_anime":
-            self.parse_file_1(delimiter="###")
-
-    def parse_file_1(self, delimiter: str) -> None:
+    def __init__(self, file_path: str, db: Database = None) -> None:
+        super().__init__(file_path, db)
+        self._formats = TABLE_FORMATS.page(self.name)
+
+    def entries(self) -> Iterator[Discussion]:
+        """Parse the contents and yield the discussion entries.
+
+        Entries start with the delimiter of the page, if one is found."""
+        if delimiter := TABLE_FORMATS.delimiter(self.name, self._file_path):
+            yield from self.parse_file_1(delimiter=delimiter)
+
+    def parse_file_1(self, delimiter: str) -> Iterator[Discussion]:
         """Parse the contents.
 
         Use the formatting for discussion archives years from 2011 to 2014."""
         while not self.out_of_bounds:
             if self.current_line.startswith(delimiter):
-                self.parse_entry(delimiter=delimiter)
+                if discussion := self.parse_entry(delimiter=delimiter):
+                    yield discussion
             else:
                 self.next_line()
 
-    def parse_entry(self, delimiter: str) -> None:
-        """Parse a discussion entry."""
+    def parse_entry(self, delimiter: str) -> Discussion:
+        """Parse a discussion entry, and return it if it has any episode."""
         series_name = self.remove_formatting(self.current_line[2:])
         # print(self.year, series_name)
-        discussion = Discussion(name=series_name, year=self.year)
+        discussion = Discussion(
+            name=series_name,
+            year=self.year,
+            section=self.start_section(series_name, self._formats.overrides),
+        )
         self.next_line()
         while (not self.out_of_bounds) and (
             not self.current_line.startswith(delimiter)
@@ -119,81 +138,85 @@ class ParserDiscussion(Parser):
             if self.current_line.count("|") >= 1:
                 if self.current_line.lstrip(punctuation + " ").startswith("Case"):
                     while self.current_line.count("|") >= 1:
-                        for pair in PERMALINK_AND_TEXT.findall(self.current_line):
-                            title, post_id = (x for x in pair if x)
-                            discussion.episodes[post_id] = title.strip()
+                        for title, post in TableDiscussionParser.permalinks(
+                            self.current_line
+                        ):
+                            discussion.episodes[post] = title.strip()
                         self.next_line()
                 else:
-                    if self.name == "long_running_anime":
-                        table_parser = TableDiscussionParser.parse_table_no_headers
-                    elif self.current_line.lstrip(punctuation + " ").startswith("Ep."):
-                        table_parser = (
-                            TableDiscussionParser.parse_table_alternate_headers
-                        )
-                    else:
-                        table_parser = TableDiscussionParser.parse_table_one_header
                     table = self.read_table()
-                    discussion.episodes |= table_parser(table)
+                    discussion.episodes |= self.parse_table(table, series_name)
             else:
-                for pair in PERMALINK_AND_TEXT.findall(self.current_line):
-                    title, post_id = (x for x in pair if x)
-                    discussion.episodes[post_id] = title.strip()
+                for title, post in TableDiscussionParser.permalinks(self.current_line):
+                    discussion.episodes[post] = title.strip()
                 self.next_line()
-        if discussion.episodes:
-            self.create_entry(discussion=discussion)
+        discussion.section_hash = self.section_hash()
+        return discussion if discussion.episodes else None
 
-    def create_entry(self, discussion: Discussion) -> None:
-        """Create a db entry."""
-        self._db.begin()
-        try:
-            with open(DISCUSSION_ENTRY_PATH, encoding="utf8") as f:
-                self._db.q.execute(f.read(), discussion.info)
-            series_id = self._db.last_row_id
-            with open(EPISODE_ENTRY_PATH, encoding="utf8") as f:
-                query = f.read()
-            for post_id, episode in discussion.episodes.items():
-                # print(self.year, series_id, discussion.name, post_id, episode)
-                self._db.q.execute(
-                    query, (series_id, post_id or None, self.remove_formatting(episode))
-                )
-            self._db.commit()
-        except Exception as e:
-            print(f"Exception: {e}")
-            print(
-                f"{self.year} - {series_id} - {discussion.name} - {post_id} - {episode}"
-            )
-            self._db.rollback()
-
-    @property
-    def year(self) -> int:
-        """Return the year included in the file name."""
-        file_name = pathlib.Path(self._file_path).stem
+    @staticmethod
+    def create_entries(db: Database, entries: Iterable[Discussion]) -> None:
+        """Add or update the given discussion entries, in a single transaction.
+
+        Entries from a wiki section unchanged since it was last added are skipped.
+        An entry that cannot be added is left out, without affecting the others."""
+        with open(DISCUSSION_ENTRY_PATH, encoding="utf8") as f:
+            discussion_query = f.read()
+        with open(EPISODE_ENTRY_PATH, encoding="utf8") as f:
+            episode_query = f.read()
+        hashes = section_hashes(db)
+        db.begin()
         try:
-            return int(file_name)
-        except ValueError:
-            return None
-
-    @property
-    def name(self) -> str:
-        """Return the file name."""
-        return pathlib.Path(self._file_path).stem
+            for discussion in entries:
+                if hashes.get(discussion.section) == discussion.section_hash:
+                    continue
+                db.savepoint("entry")
+                try:
+                    ParserDiscussion.create_entry(
+                        db, discussion, discussion_query, episode_query
+                    )
+                    save_section_hash(db, discussion.section, discussion.section_hash)
+                    db.release("entry")
+                except Exception as e:
+                    print(f"Exception: {e}")
+                    print(f"{discussion.year} - {discussion.name}")
+                    db.rollback_to("entry")
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
 
     @staticmethod
-    def parse_table() -> None:
-        pass
+    def create_entry(
+        db: Database, discussion: Discussion, discussion_query: str, episode_query: str
+    ) -> None:
+        """Insert or update a discussion and its episodes in the db.
+
+        Episodes already in another series are left there.
+        If new episodes are added to a processed series, it is processed again."""
+        series_id = db.q.execute(discussion_query, discussion.info).fetchone()["id"]
+        db.q.executemany(
+            episode_query,
+            (
+                (series_id, post_id or None, Parser.remove_formatting(episode))
+                for post_id, episode in discussion.episodes.items()
+            ),
+        )
+        db.q.execute(
+            "UPDATE discussion SET processed = 0 WHERE id = ? AND processed = 1 "
+            "AND EXISTS (SELECT 1 FROM episode WHERE id = ? AND processed = 0)",
+            (series_id, series_id),
+        )
+
+    def parse_table(self, table: list[str], entry_name: str = None) -> dict:
+        """Extract information from the table given in markdown format."""
+        return self._formats.parse(table, entry_name)
 
 
 if __name__ == "__main__":
-    # Episode discussions year 2011-2022
-    for y in range(2011, 2023):
-        print(f"Processing year {y}")
-        parser = ParserDiscussion(
-            f"{FILE_PATH}\\{y}.md", DatabaseDiscussion(path="data\\discussion.sqlite")
-        )
-        parser.parse_file()
-    # Episode discussions long running anime
-    parser = ParserDiscussion(
-        f"{FILE_PATH}\\long_running_anime.md",
+    # Episode discussions year 2011-2022, then long running anime
+    parse_files(
+        ParserDiscussion,
+        [f"{FILE_PATH}\\{y}.md" for y in range(2011, 2023)]
+        + [f"{FILE_PATH}\\long_running_anime.md"],
         DatabaseDiscussion(path="data\\discussion.sqlite"),
     )
-    parser.parse_file()
@@ -1,40 +1,87 @@
 """Parse the rewatch wiki and archive the data in the database."""
 
 import re
-import pathlib
-from database import DatabaseRewatch
-from parser_wiki import TableParser, Rewatch, Parser
+import itertools
+import dataclasses
+from typing import Iterable, Iterator
+from database import Database, DatabaseRewatch
+from parser_wiki import (
+    TableParser,
+    Rewatch,
+    Parser,
+    parse_files,
+    section_hashes,
+    save_section_hash,
+)
+from table_formats import FormatRegistry, TableFormat
 
 REWATCH_ENTRY_PATH = "src\\queries\\rewatch\\add_rewatch_entry.sql"
+FIND_REWATCH_PATH = "src\\queries\\rewatch\\find_rewatch_entry.sql"
 EPISODE_ENTRY_PATH = "src\\queries\\add_episodes.sql"
 
 FILE_PATH = "data\\wiki\\anime\\rewatches\\rewatch_archive_edited"
 
 REWATCH = re.compile(r"##[^\#]")
 HOSTS = re.compile(r"(\/?u\/[\w_-]+)")
-TABLE_LINK_AND_TEXT = re.compile(r"\[([^\|]*)\]\(\/(?:comments\/)?([^\|]+)\)")
-TABLE_HEADER = re.compile(r"\[[^\|]+\]\([^\|]+\)")
 REWATCH_YEAR = re.compile(r"(.*) \((\d+)\)")
 
 
+TABLE_FORMATS = FormatRegistry(
+    "rewatch",
+    [
+        TableFormat("no headers", TableParser.parse_table_no_headers, rows=("some",)),
+        TableFormat(
+            "alternate headers",
+            TableParser.parse_table_alternate_headers,
+            rows=("none", "some", "none"),
+        ),
+        TableFormat(
+            "alternate contents",
+            TableParser.parse_table_one_header_alternate_contents,
+            rows=("none", "odd", "odd"),
+        ),
+        TableFormat(
+            "contents right",
+            TableParser.parse_table_one_header_contents_right,
+            rows=("none", "last", "last"),
+        ),
+        TableFormat(
+            "contents left",
+            TableParser.parse_table_one_header_contents_left,
+            rows=("none", "first", "first"),
+        ),
+        # Any other table with a header
+        TableFormat(
+            "headers", TableParser.parse_table_alternate_headers, rows=("none",)
+        ),
+    ],
+)
+
+
 class ParserRewatch(Parser):
     """Parser for rewatch wiki pages."""
 
-    def parse_file(self) -> None:
-        """Parse the contents."""
+    def __init__(self, file_path: str, db: Database = None) -> None:
+        super().__init__(file_path, db)
+        self._formats = TABLE_FORMATS.page(self.name)
+
+    def entries(self) -> Iterator[Rewatch]:
+        """Parse the contents and yield the rewatch entries."""
         while not self.out_of_bounds:
             if REWATCH.match(self.current_line):
-                self.parse_entry()
+                yield from self.parse_entry()
             else:
                 self.next_line()
 
-    def parse_entry(self) -> None:
-        """Parse a rewatch entry."""
+    def parse_entry(self) -> Iterator[Rewatch]:
+        """Parse a rewatch, and yield an entry for each of its tables."""
         rewatch_name = self.remove_formatting(self.current_line[2:])
+        section = self.start_section(rewatch_name, self._formats.overrides)
         year = self.year
         if self.year == 2014:
             rewatch_name, year = REWATCH_YEAR.findall(rewatch_name)[0]
-        rewatch = Rewatch(rewatch_name=rewatch_name, year=year)
+        rewatch = Rewatch(rewatch_name=rewatch_name, year=year, section=section)
+        entries = []
         self.next_line()
         while not self.out_of_bounds:
             if REWATCH.match(self.current_line):
@@ -59,78 +106,110 @@ class ParserRewatch(Parser):
                     rewatch.hosts = ", ".join(
                         row.split("|")[1].strip() for row in rewatch.table[1:]
                     )
-                self.create_entry(rewatch=rewatch)
+                if entry := self.table_entry(rewatch):
+                    entries.append(entry)
                 rewatch.reset_table()
+        # The section must be read in full before its hash is known
+        section_hash = self.section_hash()
+        for entry in entries:
+            entry.section_hash = section_hash
+            yield entry
 
-    @staticmethod
-    def parse_table(
-        table: list[str], rewatch_name: str = None, year: int = None
-    ) -> dict:
-        """Extract information from the table given in markdown format."""
-        if (rewatch_name, year) in {
-            ("Mod Movie Series", 2022),
-            ("Summer Movie Series", 2022),
-        }:
-            return TableParser.parse_table_one_header_contents_left(table)
-        if (rewatch_name, year) in {
-            ("Ah! My Goddess", 2016),
-            ("Baka to Test", 2016),
-            ("Barakamon", 2016),
-            ("Aria", 2015),
-            ("Amagami SS", 2015),
-            ("Kara no Kyoukai", 2015),
-        }:
-            return TableParser.parse_table_one_header_alternate_contents(table)
-        if (rewatch_name, year) in {
-            ("Anime Movie Fortnight", 2015),
-            ("Halloween Horror Week", 2015),
-            ("Shinseiki Evangelion (Rebuild)", 2016),
-        }:
-            return TableParser.parse_table_one_header_contents_right(table)
-        if TABLE_LINK_AND_TEXT.findall(table[0]):
-            return TableParser.parse_table_no_headers(table)
-        if not TABLE_HEADER.findall(table[0]):
-            return TableParser.parse_table_alternate_headers(table)
-        raise ValueError("Invalid table format.")
-
-    def create_entry(self, rewatch: Rewatch) -> None:
-        """Create a db entry."""
-        self._db.begin()
+    def table_entry(self, rewatch: Rewatch) -> Rewatch:
+        """Return a copy of the rewatch with the episodes from its current table.
+
+        Return None if the table cannot be parsed."""
         try:
-            with open(REWATCH_ENTRY_PATH, encoding="utf8") as f:
-                self._db.q.execute(f.read(), rewatch.info)
-            rewatch_id = self._db.last_row_id
-            rewatch_contents = self.parse_table(
-                table=rewatch.table, rewatch_name=rewatch.rewatch_name, year=self.year
-            )
-            with open(EPISODE_ENTRY_PATH, encoding="utf8") as f:
-                query = f.read()
-            for episode, link in rewatch_contents.items():
-                if link:
-                    self._db.q.execute(
-                        query,
-                        (rewatch_id, link, Parser.remove_formatting(episode)),
-                    )
-            self._db.commit()
-        except BaseException as e:
+            episodes = self.parse_table(rewatch.table, rewatch.rewatch_name)
+        except Exception as e:
             print(f"Exception: {e}")
-            print(f"{rewatch_id} - {rewatch.rewatch_name} - {episode} - {link}")
-            self._db.rollback()
+            print(f"{rewatch.rewatch_name} - {rewatch.table_name}")
+            return None
+        return dataclasses.replace(rewatch, episodes=episodes)
+
+    def parse_table(self, table: list[str], entry_name: str = None) -> dict:
+        """Extract information from the table given in markdown format."""
+        return self._formats.parse(table, entry_name)
 
-    @property
-    def year(self) -> int:
-        """Return the year included in the file name."""
-        file_name = pathlib.Path(self._file_path).stem
+    @staticmethod
+    def create_entries(db: Database, entries: Iterable[Rewatch]) -> None:
+        """Add or update the given rewatch entries, in a single transaction.
+
+        Entries from a wiki section unchanged since it was last added are skipped.
+        An entry that cannot be added is left out, without affecting the others,
+        and the hash of its section is not saved, so that it is tried again."""
+        with open(FIND_REWATCH_PATH, encoding="utf8") as f:
+            find_query = f.read()
+        with open(REWATCH_ENTRY_PATH, encoding="utf8") as f:
+            rewatch_query = f.read()
+        with open(EPISODE_ENTRY_PATH, encoding="utf8") as f:
+            episode_query = f.read()
+        hashes = section_hashes(db)
+        db.begin()
         try:
-            return int(file_name)
-        except ValueError:
-            return None
+            # The entries of a section, one per table, come one after another
+            for section, section_entries in itertools.groupby(
+                entries, key=lambda rewatch: rewatch.section
+            ):
+                section_entries = list(section_entries)
+                section_hash = section_entries[0].section_hash
+                if hashes.get(section) == section_hash:
+                    continue
+                failed = False
+                for rewatch in section_entries:
+                    db.savepoint("entry")
+                    try:
+                        ParserRewatch.create_entry(
+                            db, rewatch, find_query, rewatch_query, episode_query
+                        )
+                        db.release("entry")
+                    except Exception as e:
+                        print(f"Exception: {e}")
+                        print(f"{rewatch.rewatch_name} - {rewatch.table_name}")
+                        db.rollback_to("entry")
+                        failed = True
+                if not failed:
+                    save_section_hash(db, section, section_hash)
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+
+    @staticmethod
+    def create_entry(
+        db: Database,
+        rewatch: Rewatch,
+        find_query: str,
+        rewatch_query: str,
+        episode_query: str,
+    ) -> None:
+        """Insert or update a rewatch and its episodes in the db.
+
+        Rewatches are looked up first, as their unique columns can be null.
+        Episodes already in another rewatch are left there.
+        If new episodes are added to a processed rewatch, it is processed again."""
+        entry = db.q.execute(find_query, rewatch.info).fetchone()
+        if entry is None:
+            entry = db.q.execute(rewatch_query, rewatch.info).fetchone()
+        rewatch_id = entry["id"]
+        db.q.executemany(
+            episode_query,
+            (
+                (rewatch_id, link, Parser.remove_formatting(episode))
+                for episode, link in rewatch.episodes.items()
+                if link
+            ),
+        )
+        db.q.execute(
+            "UPDATE rewatch SET processed = 0 WHERE id = ? AND processed = 1 "
+            "AND EXISTS (SELECT 1 FROM episode WHERE id = ? AND processed = 0)",
+            (rewatch_id, rewatch_id),
+        )
 
 
 if __name__ == "__main__":
-    for y in range(2014, 2023):
-        print(f"Processing year {y}")
-        parser = ParserRewatch(
-            f"{FILE_PATH}\\{y}.md", DatabaseRewatch(path="data\\rewatches.sqlite")
-        )
-        parser.parse_file()
+    parse_files(
+        ParserRewatch,
+        [f"{FILE_PATH}\\{y}.md" for y in range(2014, 2023)],
+        DatabaseRewatch(path="data\\rewatches.sqlite"),
+    )
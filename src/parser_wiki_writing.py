@@ -1,11 +1,12 @@
 """Parse the writing wiki and archive the data in the database."""
 
 import re
-from database import DatabaseWriting
+from typing import Iterable, Iterator
+from database import Database, DatabaseWriting
 from parser_wiki import Parser
+from table_tokenizer import relative_links
 
 WRITING_WIKI = "data\\wiki\\anime\\writing_archive.md"
-TABLE_LINK_AND_TEXT = re.compile(r"\[([^\|]*)\]\(\/(?:comments\/)?([^\|]+)\)")
 AUTHOR = re.compile(r"\/?u\/([\w_-]+)")
 
 WRITING_ENTRY_PATH = "src\\queries\\writing\\add_writing_entry.sql"
@@ -14,26 +15,23 @@ WRITING_ENTRY_PATH = "src\\queries\\writing\\add_writing_entry.sql"
 class ParserWriting(Parser):
     """Parser for the writing wiki page."""
 
-    def parse_file(self) -> None:
-        """Parse the contents and return a table of entries."""
+    def entries(self) -> Iterator[tuple[str]]:
+        """Parse the contents and yield the row data of each entry, by date."""
         table = sorted(
             [
                 table_row[1:]
-                for row in self._contents
+                for row in self.remaining_lines()
                 if row.count("|") >= 1
                 and (table_row := [x.strip() for x in row.split("|")])[0].isdigit()
             ]
         )
-        with open(WRITING_ENTRY_PATH, encoding="utf8") as f:
-            query = f.read()
         for entry in table:
-            entry_data = self.parse_entry(entry)
-            self.create_entry(data=entry_data, query=query)
+            yield self.parse_entry(entry)
 
-    def parse_entry(self, entry: list[str]) -> None:
+    def parse_entry(self, entry: list[str]) -> tuple[str]:
         """Parse row data."""
         post_date = entry[0]
-        title, post_id = TABLE_LINK_AND_TEXT.findall(entry[1])[0]
+        title, post_id = relative_links(entry[1])[0]
         if len(entry) == 3:
             if entry[-1] == "Open Discussion":
                 author = entry[-1]
@@ -47,9 +45,18 @@ class ParserWriting(Parser):
     def parse_table(self) -> None:
         """Not needed here, consider changing the ABC."""
 
-    def create_entry(self, data: tuple[str], query: str) -> None:
-        """Insert row data into db."""
-        self._db.q.execute(query, data)
+    @staticmethod
+    def create_entries(db: Database, entries: Iterable[tuple[str]]) -> None:
+        """Insert or update the row data of the given entries, in one transaction."""
+        with open(WRITING_ENTRY_PATH, encoding="utf8") as f:
+            query = f.read()
+        db.begin()
+        try:
+            db.q.executemany(query, entries)
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
 
 
 if __name__ == "__main__":
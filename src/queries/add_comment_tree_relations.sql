@@ -1,2 +1,2 @@
-INSERT INTO comment_tree (post_id, comment_id, parent_id)
-VALUES (?, ?, ?)
\ No newline at end of file
+INSERT INTO comment_tree (post_id, comment_id, parent_id, path, depth, sibling_order)
+VALUES (?, ?, ?, ?, ?, ?)
\ No newline at end of file
@@ -1,2 +1,4 @@
 INSERT INTO episode (id, post_id, title)
-VALUES (?, ?, ?);
\ No newline at end of file
+VALUES (?, ?, ?)
+ON CONFLICT (post_id) DO UPDATE SET title = excluded.title
+WHERE episode.id = excluded.id;
\ No newline at end of file
@@ -0,0 +1 @@
+INSERT OR REPLACE INTO imgur_album_image (album_id, image_id, position) VALUES (?, ?, ?)
\ No newline at end of file
@@ -0,0 +1,9 @@
+INSERT INTO imgur_album (album_id, title, description, uploaded, images_count, link, data)
+VALUES (:album_id, :title, :description, :uploaded, :images_count, :link, :data)
+ON CONFLICT (album_id) DO UPDATE SET
+    title = excluded.title
+    , description = excluded.description
+    , uploaded = excluded.uploaded
+    , images_count = excluded.images_count
+    , link = excluded.link
+    , data = excluded.data
@@ -0,0 +1,2 @@
+INSERT OR REPLACE INTO imgur_image (image_id, title, description, uploaded, type, animated, width, height, size, link, data)
+VALUES (:image_id, :title, :description, :uploaded, :type, :animated, :width, :height, :size, :link, :data)
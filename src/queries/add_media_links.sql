@@ -0,0 +1 @@
+INSERT OR IGNORE INTO media_link (comment_id, is_submission, host, link) VALUES (?, ?, ?, ?)
\ No newline at end of file
@@ -0,0 +1,7 @@
+SELECT reply.*
+FROM comment_tree AS reply
+JOIN comment_tree AS root ON root.comment_id = ?
+WHERE reply.post_id = root.post_id
+    AND reply.path > root.path || '/'
+    AND reply.path < root.path || '0' -- '0' is the character right after '/'
+ORDER BY reply.path
\ No newline at end of file
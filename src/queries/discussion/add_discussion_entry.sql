@@ -1,2 +1,4 @@
 INSERT INTO discussion (series_name, series_year, notes)
-VALUES (?, ?, ?);
\ No newline at end of file
+VALUES (?, ?, ?)
+ON CONFLICT (series_name) DO UPDATE SET series_name = excluded.series_name
+RETURNING id;
\ No newline at end of file
@@ -0,0 +1,33 @@
+ALTER TABLE comment_tree ADD COLUMN path TEXT; -- ids from the top level comment to this one, separated by /
+ALTER TABLE comment_tree ADD COLUMN depth INTEGER; -- 0 for top level comments
+ALTER TABLE comment_tree ADD COLUMN sibling_order INTEGER; -- position among the replies to the same parent, by creation time
+
+CREATE TEMP TABLE comment_path AS
+WITH RECURSIVE tree (comment_id, path, depth) AS (
+    SELECT comment_id, comment_id, 0
+    FROM comment_tree
+    WHERE parent_id IS NULL OR parent_id NOT IN (SELECT comment_id FROM comment_tree)
+    UNION ALL
+    SELECT comment_tree.comment_id, tree.path || '/' || comment_tree.comment_id, tree.depth + 1
+    FROM comment_tree JOIN tree ON comment_tree.parent_id = tree.comment_id
+)
+SELECT
+    tree.comment_id
+    , tree.path
+    , tree.depth
+    , ROW_NUMBER() OVER (
+        PARTITION BY comment_tree.post_id, CASE WHEN tree.depth > 0 THEN comment_tree.parent_id END
+        ORDER BY LENGTH(comment_tree.comment_id), comment_tree.comment_id
+    ) - 1 AS sibling_order
+FROM tree JOIN comment_tree ON tree.comment_id = comment_tree.comment_id;
+
+UPDATE comment_tree
+SET path = comment_path.path, depth = comment_path.depth, sibling_order = comment_path.sibling_order
+FROM comment_path
+WHERE comment_path.comment_id = comment_tree.comment_id;
+
+DROP TABLE comment_path;
+
+CREATE INDEX IF NOT EXISTS comment_tree_path ON comment_tree (post_id, path);
+
+CREATE INDEX IF NOT EXISTS comment_tree_depth ON comment_tree (post_id, depth);
@@ -0,0 +1,31 @@
+CREATE TABLE IF NOT EXISTS imgur_image (
+    image_id TEXT NOT NULL PRIMARY KEY
+    , title TEXT
+    , description TEXT
+    , uploaded INTEGER -- upload time, in seconds since the epoch
+    , type TEXT -- MIME type, e.g. image/gif
+    , animated INTEGER -- 1 = animated
+    , width INTEGER
+    , height INTEGER
+    , size INTEGER -- in bytes
+    , link TEXT NOT NULL -- direct link to the image file
+    , data TEXT NOT NULL -- API data of the image, as JSON
+);
+
+CREATE TABLE IF NOT EXISTS imgur_album (
+    album_id TEXT NOT NULL PRIMARY KEY
+    , title TEXT
+    , description TEXT
+    , uploaded INTEGER -- upload time, in seconds since the epoch
+    , images_count INTEGER -- number of images in the album, according to the API
+    , link TEXT
+    , data TEXT NOT NULL -- API data of the album, as JSON, with only the ids of its images
+);
+
+CREATE TABLE IF NOT EXISTS imgur_album_image (
+    album_id TEXT NOT NULL
+    , image_id TEXT NOT NULL -- the image is in imgur_image once downloaded
+    , position INTEGER NOT NULL -- position of the image in the album, from 0
+    , PRIMARY KEY (album_id, position)
+    , FOREIGN KEY(album_id) REFERENCES imgur_album(album_id) ON DELETE CASCADE
+);
@@ -0,0 +1,9 @@
+CREATE TABLE IF NOT EXISTS media_link (
+    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE
+    , comment_id TEXT NOT NULL -- submission/comment id
+    , is_submission INTEGER NOT NULL DEFAULT 0 -- 0 = comment, 1 = submission
+    , host TEXT NOT NULL -- name of the image host, as in link_scanner.HOSTS
+    , link TEXT NOT NULL
+    , archived INTEGER NOT NULL DEFAULT 0 -- 1|2 = the link was|wasn't archived within the required time frame
+    , UNIQUE (comment_id, is_submission, link) -- only make one entry even if the same link is repeated multiple times in the same post/comment
+);
@@ -0,0 +1,6 @@
+CREATE TABLE IF NOT EXISTS parsed_file (
+    file_name TEXT NOT NULL PRIMARY KEY -- dump file the links were parsed from, relative to the dump folder, or submission id followed by .pack for a record in the pack of the dumps
+    , size INTEGER NOT NULL -- size of the file or record in bytes when it was last parsed
+    , mtime_ns INTEGER NOT NULL -- modification time of the file in nanoseconds, or offset of the record in the pack, when it was last parsed
+    , content_hash TEXT NOT NULL -- hash of the file contents when it was last parsed
+);
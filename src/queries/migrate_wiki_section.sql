@@ -0,0 +1,6 @@
+CREATE TABLE IF NOT EXISTS wiki_section (
+    file_name TEXT NOT NULL -- wiki page the section was parsed from
+    , section TEXT NOT NULL -- section title, followed by its occurrence number in the page
+    , content_hash TEXT NOT NULL -- hash of the section contents when it was last parsed
+    , PRIMARY KEY (file_name, section)
+);
\ No newline at end of file
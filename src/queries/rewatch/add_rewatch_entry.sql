@@ -1,2 +1,3 @@
 INSERT INTO rewatch (rewatch_name, alt_name, sub_name, rewatch_year, hosts)
-VALUES (?, ?, ?, ?, ?);
\ No newline at end of file
+VALUES (?, ?, ?, ?, ?)
+RETURNING id;
\ No newline at end of file
@@ -0,0 +1,6 @@
+SELECT id FROM rewatch
+WHERE rewatch_name IS ?
+    AND alt_name IS ?
+    AND sub_name IS ?
+    AND rewatch_year IS ?
+    AND hosts IS ?;
\ No newline at end of file
@@ -0,0 +1,3 @@
+ALTER TABLE episode ADD COLUMN processed INTEGER NOT NULL DEFAULT 0; -- 1 if the comment tree of the post was scraped, 2 if the post was not found
+
+UPDATE episode SET processed = 1 WHERE id IN (SELECT id FROM rewatch WHERE processed = 1);
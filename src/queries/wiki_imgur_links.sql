@@ -0,0 +1,7 @@
+CREATE TABLE IF NOT EXISTS wiki_imgur_link (
+    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE
+    , page TEXT NOT NULL -- file path relative to the scanned folder, without extension
+    , imgur_link TEXT NOT NULL
+    , link_text TEXT NOT NULL
+    , UNIQUE (page, imgur_link, link_text)
+);
@@ -1,2 +1,6 @@
 INSERT INTO writing (post_id, title, post_date, author)
-VALUES (?, ?, ?, ?);
\ No newline at end of file
+VALUES (?, ?, ?, ?)
+ON CONFLICT (post_id) DO UPDATE SET
+    title = excluded.title
+    , post_date = excluded.post_date
+    , author = excluded.author;
\ No newline at end of file
@@ -4,16 +4,23 @@ CREATE TABLE IF NOT EXISTS writing (
     , title TEXT NOT NULL
     , post_date TEXT
     , author TEXT
-    , processed INTEGER NOT NULL DEFAULT 0 -- 1 if the comment tree was scraped
+    , processed INTEGER NOT NULL DEFAULT 0 -- 1 if the comment tree was scraped, 2 if the post was not found
 );
 
 CREATE TABLE IF NOT EXISTS comment_tree (
     comment_id TEXT NOT NULL PRIMARY KEY UNIQUE
     , post_id TEXT NOT NULL
     , parent_id TEXT -- None for top level comments
+    , path TEXT -- ids from the top level comment to this one, separated by /
+    , depth INTEGER -- 0 for top level comments
+    , sibling_order INTEGER -- position among the replies to the same parent, by creation time
     , FOREIGN KEY(post_id) REFERENCES writing(post_id) ON DELETE RESTRICT ON UPDATE CASCADE
 );
 
+CREATE INDEX IF NOT EXISTS comment_tree_path ON comment_tree (post_id, path);
+
+CREATE INDEX IF NOT EXISTS comment_tree_depth ON comment_tree (post_id, depth);
+
 CREATE TABLE IF NOT EXISTS imgur_link (
     id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE
     , comment_id TEXT NOT NULL -- submission/comment id
@@ -24,3 +31,52 @@ CREATE TABLE IF NOT EXISTS imgur_link (
     , archived INTEGER NOT NULL DEFAULT 0 -- 1|2 = the link was|wasn't archived within the required time frame
     , UNIQUE (comment_id, is_submission, imgur_link) -- only make one entry even if the same link is repeated multiple times in the same post/comment
 );
+
+CREATE TABLE IF NOT EXISTS media_link (
+    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE
+    , comment_id TEXT NOT NULL -- submission/comment id
+    , is_submission INTEGER NOT NULL DEFAULT 0 -- 0 = comment, 1 = submission
+    , host TEXT NOT NULL -- name of the image host, as in link_scanner.HOSTS
+    , link TEXT NOT NULL
+    , archived INTEGER NOT NULL DEFAULT 0 -- 1|2 = the link was|wasn't archived within the required time frame
+    , UNIQUE (comment_id, is_submission, link) -- only make one entry even if the same link is repeated multiple times in the same post/comment
+);
+
+CREATE TABLE IF NOT EXISTS parsed_file (
+    file_name TEXT NOT NULL PRIMARY KEY -- dump file the links were parsed from, relative to the dump folder, or submission id followed by .pack for a record in the pack of the dumps
+    , size INTEGER NOT NULL -- size of the file or record in bytes when it was last parsed
+    , mtime_ns INTEGER NOT NULL -- modification time of the file in nanoseconds, or offset of the record in the pack, when it was last parsed
+    , content_hash TEXT NOT NULL -- hash of the file contents when it was last parsed
+);
+
+CREATE TABLE IF NOT EXISTS imgur_image (
+    image_id TEXT NOT NULL PRIMARY KEY
+    , title TEXT
+    , description TEXT
+    , uploaded INTEGER -- upload time, in seconds since the epoch
+    , type TEXT -- MIME type, e.g. image/gif
+    , animated INTEGER -- 1 = animated
+    , width INTEGER
+    , height INTEGER
+    , size INTEGER -- in bytes
+    , link TEXT NOT NULL -- direct link to the image file
+    , data TEXT NOT NULL -- API data of the image, as JSON
+);
+
+CREATE TABLE IF NOT EXISTS imgur_album (
+    album_id TEXT NOT NULL PRIMARY KEY
+    , title TEXT
+    , description TEXT
+    , uploaded INTEGER -- upload time, in seconds since the epoch
+    , images_count INTEGER -- number of images in the album, according to the API
+    , link TEXT
+    , data TEXT NOT NULL -- API data of the album, as JSON, with only the ids of its images
+);
+
+CREATE TABLE IF NOT EXISTS imgur_album_image (
+    album_id TEXT NOT NULL
+    , image_id TEXT NOT NULL -- the image is in imgur_image once downloaded
+    , position INTEGER NOT NULL -- position of the image in the album, from 0
+    , PRIMARY KEY (album_id, position)
+    , FOREIGN KEY(album_id) REFERENCES imgur_album(album_id) ON DELETE CASCADE
+);
@@ -0,0 +1,381 @@
+"""Local stand-in for the parts of the Reddit API used by the comment scrapers.
+
+Serve synthetic submissions and comment trees of a given shape,
+rendered and truncated the way Reddit does it:
+- at most ``INITIAL_LIMIT`` comments when a submission is fetched,
+  the rest being hidden behind ``MoreComments``;
+- at most ``MAX_DEPTH`` levels of replies per response,
+  deeper replies being hidden behind "continue this thread" links;
+- at most ``MORECHILDREN_LIMIT`` comments per ``morechildren`` request.
+
+Use the settings from ``FixtureServer.settings`` to point PRAW to it."""
+
+import json
+import random
+import threading
+import collections
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+INITIAL_LIMIT = 200
+MAX_DEPTH = 10
+MORECHILDREN_LIMIT = 100
+
+SUBREDDIT = "anime"
+FIRST_ID = 36**6
+CREATED_UTC = 1_600_000_000
+
+
+def base36(number: int) -> str:
+    """Return the base 36 representation of a number, as used in Reddit ids."""
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    ans = ""
+    while number:
+        number, digit = divmod(number, 36)
+        ans = digits[digit] + ans
+    return ans or "0"
+
+
+@dataclass
+class Thread:
+    """A synthetic submission and its comments."""
+
+    submission_id: str
+    title: str
+    parents: dict[str, str] = field(default_factory=dict)
+    children: dict[str, list[str]] = field(default_factory=dict)
+    depths: dict[str, int] = field(default_factory=dict)
+
+    def add_comment(self, comment_id: str, parent_id: str = None) -> None:
+        """Add a comment replying to the given comment, or to the submission."""
+        self.parents[comment_id] = parent_id
+        self.depths[comment_id] = self.depths[parent_id] + 1 if parent_id else 0
+        self.children.setdefault(parent_id, []).append(comment_id)
+
+    @property
+    def top_level(self) -> list[str]:
+        """Return the ids of the top level comments."""
+        return self.children.get(None, [])
+
+    def subtree(self, comment_ids: list[str]) -> list[str]:
+        """Return the given comments and all their replies."""
+        ans = []
+        stack = list(reversed(comment_ids))
+        while stack:
+            comment_id = stack.pop()
+            ans.append(comment_id)
+            stack.extend(reversed(self.children.get(comment_id, [])))
+        return ans
+
+
+def generate_thread(
+    submission_id: str,
+    shape: str,
+    num_comments: int,
+    seed: int = 0,
+    first_id: int = FIRST_ID,
+) -> Thread:
+    """Generate a thread with the given number of comments.
+
+    Shapes:
+    - wide: mostly top level comments with few replies;
+    - deep: long reply chains;
+    - megathread: a mix of both, replies favouring recent comments.
+
+    Comment ids are numbered from ``first_id``, to be unique across threads."""
+    rng = random.Random(seed)
+    thread = Thread(submission_id=submission_id, title=f"{shape} thread")
+    comment_ids = []
+    for n in range(num_comments):
+        comment_id = base36(first_id + n)
+        if not comment_ids:
+            parent_id = None
+        elif shape == "wide":
+            parent_id = None if rng.random() < 0.9 else rng.choice(comment_ids)
+        elif shape == "deep":
+            parent_id = None if rng.random() < 0.01 else comment_ids[-1]
+        elif shape == "megathread":
+            if rng.random() < 0.3:
+                parent_id = None
+            else:
+                parent_id = rng.choice(comment_ids[-1000:])
+        else:
+            raise ValueError(f"Unknown thread shape: {shape}")
+        thread.add_comment(comment_id, parent_id)
+        comment_ids.append(comment_id)
+    return thread
+
+
+class FixtureServer:
+    """An HTTP server answering Reddit API requests about the given threads."""
+
+    def __init__(self, threads: list[Thread], port: int = 0) -> None:
+        """Initialise the server on the given port, or on a free port if 0."""
+        self._threads = {thread.submission_id: thread for thread in threads}
+        self._lock = threading.Lock()
+        self.requests = collections.Counter()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """Return the base url of the server."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def settings(self) -> dict:
+        """Return the ``praw.Reddit`` settings to use the server."""
+        return {
+            "client_id": "fixture",
+            "client_secret": "fixture",
+            "user_agent": "reddit fixture",
+            "oauth_url": self.url,
+            "reddit_url": self.url,
+            "check_for_updates": False,
+            "check_for_async": False,
+        }
+
+    def start(self) -> None:
+        """Start serving in a background thread."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop serving."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_count(self) -> None:
+        """Reset the request counter."""
+        with self._lock:
+            self.requests.clear()
+
+    def count(self, endpoint: str) -> None:
+        """Count a request to the given endpoint."""
+        with self._lock:
+            self.requests[endpoint] += 1
+
+    def _handler(self) -> type:
+        """Return the request handler class bound to this server."""
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Dispatch requests to the fixture."""
+
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                """Answer a GET request."""
+                url = urlsplit(self.path)
+                self.respond(fixture.get(url.path, parse_qs(url.query)))
+
+            def do_POST(self) -> None:  # pylint: disable=invalid-name
+                """Answer a POST request."""
+                length = int(self.headers.get("Content-Length", 0))
+                form = parse_qs(self.rfile.read(length).decode("utf8"))
+                self.respond(fixture.post(urlsplit(self.path).path, form))
+
+            def respond(self, data: dict | list | None) -> None:
+                """Send the data as JSON, or a 404 if there is none."""
+                if data is None:
+                    self.send_error(404)
+                    return
+                body = json.dumps(data).encode("utf8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=UTF-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                """Do not log requests."""
+
+        return Handler
+
+    def get(self, path: str, params: dict) -> dict | list | None:
+        """Return the response to a GET request."""
+        parts = [part for part in path.split("/") if part]
+        if parts[:2] == ["api", "info"]:
+            self.count("info")
+            fullnames = ",".join(params.get("id", [])).split(",")
+            return listing(
+                [
+                    self.submission_data(fullname[3:])
+                    for fullname in fullnames
+                    if fullname[3:] in self._threads
+                ]
+            )
+        if parts and parts[0] == "comments" and parts[1] in self._threads:
+            thread = self._threads[parts[1]]
+            if len(parts) == 4 and parts[2] == "_":
+                self.count("continue")
+                roots = [parts[3]] if parts[3] in thread.parents else []
+            else:
+                self.count("submission")
+                roots = thread.top_level
+            return [
+                listing([self.submission_data(thread.submission_id)]),
+                listing(self.render(thread, roots)),
+            ]
+        return None
+
+    def post(self, path: str, form: dict) -> dict | None:
+        """Return the response to a POST request."""
+        parts = [part for part in path.split("/") if part]
+        if parts == ["api", "v1", "access_token"]:
+            self.count("access_token")
+            return {
+                "access_token": "fixture",
+                "token_type": "bearer",
+                "expires_in": 86400,
+                "scope": "*",
+            }
+        if parts == ["api", "morechildren"]:
+            self.count("morechildren")
+            thread = self._threads.get(form["link_id"][0][3:])
+            if thread is None:
+                return None
+            requested = form["children"][0].split(",")
+            things = [
+                {"kind": "t1", "data": self.comment_data(thread, comment_id, "")}
+                for comment_id in requested[:MORECHILDREN_LIMIT]
+            ]
+            if requested[MORECHILDREN_LIMIT:]:
+                things.append(
+                    more_data(
+                        requested[MORECHILDREN_LIMIT:],
+                        f"t3_{thread.submission_id}",
+                        thread.depths[requested[MORECHILDREN_LIMIT]],
+                    )
+                )
+            return {"json": {"errors": [], "data": {"things": things}}}
+        return None
+
+    def submission_data(self, submission_id: str) -> dict:
+        """Return the API data of a submission."""
+        thread = self._threads[submission_id]
+        return {
+            "kind": "t3",
+            "data": {
+                "id": submission_id,
+                "name": f"t3_{submission_id}",
+                "title": thread.title,
+                "selftext": "",
+                "author": "fixture_author",
+                "subreddit": SUBREDDIT,
+                "created": CREATED_UTC,
+                "created_utc": CREATED_UTC,
+                "edited": False,
+                "num_comments": len(thread.parents),
+                "score": 1,
+                "ups": 1,
+                "upvote_ratio": 1.0,
+                "gilded": 0,
+                "archived": True,
+                "locked": False,
+                "permalink": f"/r/{SUBREDDIT}/comments/{submission_id}/",
+            },
+        }
+
+    @staticmethod
+    def comment_data(thread: Thread, comment_id: str, replies: dict | str) -> dict:
+        """Return the API data of a comment."""
+        parent_id = thread.parents[comment_id]
+        return {
+            "id": comment_id,
+            "name": f"t1_{comment_id}",
+            "author": f"user_{int(comment_id, 36) % 1000}",
+            "body": f"Comment {comment_id}, see https://imgur.com/{comment_id}",
+            "subreddit": SUBREDDIT,
+            "link_id": f"t3_{thread.submission_id}",
+            "parent_id": (
+                f"t1_{parent_id}" if parent_id else f"t3_{thread.submission_id}"
+            ),
+            "created": CREATED_UTC + int(comment_id, 36) - FIRST_ID,
+            "created_utc": CREATED_UTC + int(comment_id, 36) - FIRST_ID,
+            "edited": False,
+            "score": 1,
+            "ups": 1,
+            "downs": 0,
+            "depth": thread.depths[comment_id],
+            "gilded": 0,
+            "replies": replies,
+        }
+
+    def render(self, thread: Thread, roots: list[str]) -> list[dict]:
+        """Render the given comments and their replies, truncated as Reddit does."""
+        budget = INITIAL_LIMIT
+        base_depth = thread.depths[roots[0]] if roots else 0
+        rendered = []
+        # Each entry: sibling ids, index of the next one to render, list to render into
+        stack = [(roots, 0, rendered)]
+        while stack:
+            siblings, index, target = stack.pop()
+            if index >= len(siblings):
+                continue
+            comment_id = siblings[index]
+            parent_id = thread.parents[comment_id]
+            parent = f"t1_{parent_id}" if parent_id else f"t3_{thread.submission_id}"
+            depth = thread.depths[comment_id]
+            if budget <= 0:
+                target.append(
+                    more_data(thread.subtree(siblings[index:]), parent, depth)
+                )
+                continue
+            budget -= 1
+            stack.append((siblings, index + 1, target))
+            replies = thread.children.get(comment_id, [])
+            if not replies:
+                target.append(
+                    {"kind": "t1", "data": self.comment_data(thread, comment_id, "")}
+                )
+                continue
+            children = []
+            target.append(
+                {
+                    "kind": "t1",
+                    "data": self.comment_data(thread, comment_id, listing(children)),
+                }
+            )
+            if depth + 1 - base_depth >= MAX_DEPTH:
+                children.append(continue_data(comment_id, depth + 1))
+            else:
+                stack.append((replies, 0, children))
+        return rendered
+
+
+def listing(children: list[dict]) -> dict:
+    """Return a listing with the given children."""
+    return {
+        "kind": "Listing",
+        "data": {"children": children, "after": None, "before": None},
+    }
+
+
+def more_data(comment_ids: list[str], parent: str, depth: int) -> dict:
+    """Return the API data of a ``MoreComments`` hiding the given comments."""
+    return {
+        "kind": "more",
+        "data": {
+            "count": len(comment_ids),
+            "name": f"t1_{comment_ids[0]}",
+            "id": comment_ids[0],
+            "parent_id": parent,
+            "depth": depth,
+            "children": comment_ids,
+        },
+    }
+
+
+def continue_data(parent_id: str, depth: int) -> dict:
+    """Return the API data of a "continue this thread" link."""
+    return {
+        "kind": "more",
+        "data": {
+            "count": 0,
+            "name": "t1__",
+            "id": "_",
+            "parent_id": f"t1_{parent_id}",
+            "depth": depth,
+            "children": [],
+        },
+    }
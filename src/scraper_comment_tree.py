@@ -1,144 +1,621 @@
 """Scrape submissions and comments."""
 
+import io
 import pathlib
 import json
-import pickle
 import abc
-from typing import Any
+import heapq
+import tempfile
+from typing import Any, BinaryIO, Iterable, Iterator
 import praw
 from praw.models.reddit.submission import Submission
 from praw.models.reddit.comment import Comment
+from praw.models.reddit.more import MoreComments
 from database import Database
+from checkpoint import ExpansionCheckpoint
+from comment_store import CommentStore
+from comment_tree import walk_tree
+from pack_store import PACK_EXTENSION, PackStore
+from compression import (
+    DICTIONARY_EXTENSION,
+    EXTENSIONS,
+    ZSTD,
+    check_method,
+    compressed_writer,
+    load_dictionary,
+    open_writer,
+)
+from comment_archive import (
+    ArchiveWriter,
+    ARCHIVE_EXTENSION,
+    SUBMISSION,
+    read_archive,
+    is_valid_archive,
+)
 
 QUERY_PATH = "src\\queries\\add_comment_tree_relations.sql"
 with open(QUERY_PATH, encoding="utf8") as F:
     ADD_COMMENT_TREE_RELATIONS = F.read()
 
+# Number of resolved ``MoreComments`` between two saves of the frontier
+CHECKPOINT_INTERVAL = 20
+# Fields of the archived comments updated when refreshing a submission
+REFRESHED_FIELDS = ("score", "edited", "body")
+# Text left in place of the body of deleted or removed posts
+DELETED_TEXTS = ("[deleted]", "[removed]")
+
 
 class CommentTreeScraper(abc.ABC):
     """The scraper."""
 
-    def __init__(self, config_name: str, db: Database) -> None:
+    def __init__(
+        self,
+        config_name: str,
+        db: Database,
+        memory_limit: int = None,
+        compression: str = None,
+        **settings,
+    ) -> None:
         """Initialise a Reddit instance for the given bot name.
 
-        The configuration must be in a .ini file in the workspace folder."""
+        The configuration must be in a .ini file in the workspace folder.
+        Extra settings override the ones in the configuration.
+        If a memory limit (in MB of JSON) is given, the comment data beyond it
+        is kept on disk instead of in memory.
+        If a compression method (gzip or zstd) is given, the JSON dumps
+        are compressed with it."""
+        check_method(compression)
+        self._compression = compression
         self._db = db
-        self._reddit: praw.Reddit = praw.Reddit(config_name)
+        self._reddit: praw.Reddit = praw.Reddit(config_name, **settings)
+        self._memory_limit = memory_limit * 2**20 if memory_limit else None
         self._submission: Submission = None
-        self._comments: list[Comment] = None
+        self._submission_data: dict = None
+        self._comments: CommentStore = None
+        self._checkpoint: ExpansionCheckpoint = None
+        self._archived_ids: set[str] = set()
+        self._packs: dict[str, PackStore] = {}
 
-    def select_submission(self, submission_id: str) -> None:
+    def select_submission(
+        self, submission_id: str, checkpoint_path: str = None
+    ) -> None:
         """Pick the submission to scrape.
 
-        Automatically calls ``replace_more()`` to remove all ``MoreComments`` objects
-        and get a non-lazy ``Submission`` object."""
+        Resolve all ``MoreComments`` objects and keep the raw data of every comment.
+        If a checkpoint path is given, the progress is saved there during the expansion,
+        and an interrupted expansion of the same submission is resumed."""
         self._submission: Submission = self._reddit.submission(submission_id)
         self._submission.comment_sort = "old"
-        self._submission.comments.replace_more(limit=None)
-        self._comments = self._submission.comments.list()
+        self._checkpoint = (
+            ExpansionCheckpoint(path=checkpoint_path, submission_id=submission_id)
+            if checkpoint_path
+            else None
+        )
+        self.reset_comments()
+        if self._checkpoint and self._checkpoint.exists:
+            # The comment forest is not used, so the submission must be fetched here:
+            # reading an attribute PRAW has not loaded yet fetches it
+            num_comments = self._submission.num_comments
+            self._comments.update(self._checkpoint.read_comments())
+            frontier_data = self._checkpoint.load_frontier()
+            print(
+                f"Resuming submission {submission_id} ({num_comments} comments): "
+                f"{len(self._comments)} comments found, "
+                f"{len(frontier_data)} MoreComments left"
+            )
+        else:
+            if self._checkpoint:
+                self._checkpoint.clear()
+            frontier_data = [
+                self.more_comments_data(item)
+                for item in self.collect_comments(self._submission.comments)
+            ]
+        self._archived_ids = set()
+        self._submission_data = self.submission_record(self._submission)
+        self.release_submission()
+        self.expand_comments([self.load_more_comments(data) for data in frontier_data])
+
+    def refresh_submission(self, submission_id: str, path: str) -> None:
+        """Pick a submission already archived in the given path, and update it.
+
+        Start from the archived comments and only resolve the ``MoreComments``
+        containing comments that are not archived yet.
+        Since ``MoreComments`` list all the comments hidden in their subtree,
+        replies to archived comments are found as well.
+        The archived comments are then fetched again by id,
+        to update their score, edits and body."""
+        self.load_archive(self.archive_source(path, submission_id))
+        self._archived_ids = set(self._comments)
+        self._submission: Submission = self._reddit.submission(submission_id)
+        self._submission.comment_sort = "new"
+        self._checkpoint = None
+        frontier_data = [
+            self.more_comments_data(item)
+            for item in self.collect_comments(self._submission.comments)
+        ]
+        self._submission_data = self.submission_record(self._submission)
+        self.release_submission()
+        self.expand_comments(
+            [self.load_more_comments(data) for data in frontier_data],
+            skip_ids=self._archived_ids,
+        )
+        updated = self.refresh_comments(self._archived_ids)
+        print(
+            f"Submission {submission_id} refreshed: "
+            f"{len(self._comments) - len(self._archived_ids)} new comments found, "
+            f"{updated} comments updated"
+        )
+
+    def refresh_comments(self, comment_ids: Iterable[str]) -> int:
+        """Fetch the given comments again, and update their score, edits and body.
+
+        The comments are fetched by id, up to 100 per request.
+        Comments that cannot be fetched keep their data.
+        Return the number of comments updated."""
+        fullnames = (f"t1_{comment_id}" for comment_id in comment_ids)
+        updated = 0
+        for comment in self._reddit.info(fullnames=fullnames):
+            data = vars(comment)
+            record = self._comments[data["id"]]
+            record.update(
+                {field: data[field] for field in REFRESHED_FIELDS if field in data}
+            )
+            self._comments.add(record)
+            updated += 1
+        return updated
+
+    def restore_submission(self, submission_id: str, path: str) -> bool:
+        """Pick a submission from its archive in the given path, without fetching it.
+
+        Return whether a valid archive was found."""
+        if not is_valid_archive(self.archive_source(path, submission_id)):
+            return False
+        self._submission_data = self.load_archive(
+            self.archive_source(path, submission_id)
+        )
+        self._submission = None
+        self._checkpoint = None
+        self._archived_ids = set()
+        return True
+
+    def prefetch_submissions(self, submission_ids: Iterable[str]) -> dict[str, dict]:
+        """Return the raw data of the given submissions, indexed by id.
+
+        The data is fetched for up to 100 submissions per request.
+        Submissions that cannot be found, or that were deleted or removed,
+        are left out. The others are sorted by number of comments, largest first,
+        so that the longest scrapes are not left for last."""
+        fullnames = [f"t3_{submission_id}" for submission_id in submission_ids]
+        records = [
+            record
+            for submission in self._reddit.info(fullnames=fullnames)
+            if not self.is_deleted(record := self.submission_record(submission))
+        ]
+        records.sort(key=lambda record: record["num_comments"], reverse=True)
+        return {record["id"]: record for record in records}
+
+    def scrape_submission(
+        self,
+        submission_id: str,
+        path: str,
+        json_lines: bool = False,
+        prefetched: dict = None,
+        packed: bool = False,
+    ) -> None:
+        """Scrape a submission and dump everything in the given path.
+
+        If the submission was already archived there, the archive is reused
+        and only the other dumps are written again.
+        If prefetched data shows that the submission has no comments,
+        it is used as is, without fetching the submission again."""
+        if self.restore_submission(submission_id, path=path):
+            print(f"Valid archive of submission {submission_id} found")
+            self.dump_all(
+                path=path, json_lines=json_lines, archive=False, packed=packed
+            )
+        elif prefetched is not None and prefetched["num_comments"] == 0:
+            print(f"Submission {submission_id} has no comments")
+            self._submission = None
+            self._submission_data = prefetched
+            self.reset_comments()
+            self._checkpoint = None
+            self._archived_ids = set()
+            self.dump_all(path=path, json_lines=json_lines, packed=packed)
+        else:
+            self.select_submission(submission_id, checkpoint_path=path)
+            self.dump_all(path=path, json_lines=json_lines, packed=packed)
+
+    def reset_comments(self) -> None:
+        """Start a new, empty comment store."""
+        if self._comments is not None:
+            self._comments.close()
+        self._comments = CommentStore(memory_limit=self._memory_limit)
+
+    def load_archive(self, file: pathlib.PurePath | BinaryIO) -> dict:
+        """Load the comments of an archive, and return the submission data."""
+        self.reset_comments()
+        submission = None
+        for kind, data in read_archive(file):
+            if kind == SUBMISSION:
+                submission = data
+            else:
+                self._comments.add(data)
+        return submission
+
+    def release_submission(self) -> None:
+        """Replace the submission with a lazy copy, dropping its comment forest.
+
+        PRAW keeps every comment object of the forest in the submission;
+        the copy only holds what is needed to resolve ``MoreComments``."""
+        submission = self._reddit.submission(self._submission.id)
+        submission.comment_sort = self._submission.comment_sort
+        self._submission = submission
+
+    def collect_comments(self, forest: Iterable) -> list[MoreComments]:
+        """Record the comments in the forest and return its ``MoreComments``."""
+        more_comments = []
+        records = []
+        stack = list(reversed(list(forest)))
+        while stack:
+            item = stack.pop()
+            if isinstance(item, MoreComments):
+                item.submission = self._submission
+                more_comments.append(item)
+            else:
+                records.append(self.comment_record(item))
+                stack.extend(reversed(list(item.replies)))
+        self._comments.update(records)
+        if self._checkpoint:
+            self._checkpoint.add_comments(records)
+        return more_comments
+
+    def expand_comments(
+        self, frontier: list[MoreComments], skip_ids: set[str] = None
+    ) -> None:
+        """Resolve the given ``MoreComments`` and all the ones found within them.
+
+        The largest ones are resolved first, as in ``CommentForest.replace_more``.
+        Comments whose id is in ``skip_ids`` are not requested.
+        Resolved comments are not attached to the submission,
+        so that their PRAW objects are released once recorded."""
+        if skip_ids:
+            frontier = self.skip_comments(frontier, skip_ids)
+        heapq.heapify(frontier)
+        self.save_frontier(frontier)
+        resolved = 0
+        while frontier:
+            more_comments = heapq.heappop(frontier)
+            found = self.collect_comments(more_comments.comments(update=False))
+            if skip_ids:
+                found = self.skip_comments(found, skip_ids)
+            for item in found:
+                heapq.heappush(frontier, item)
+            resolved += 1
+            if resolved % CHECKPOINT_INTERVAL == 0:
+                self.save_frontier(frontier)
+        self.save_frontier(frontier)
+
+    @staticmethod
+    def skip_comments(
+        frontier: list[MoreComments], skip_ids: set[str]
+    ) -> list[MoreComments]:
+        """Remove the given comment ids from the ``MoreComments``.
+
+        Drop the ``MoreComments`` left empty.
+        The ones leading to a "continue this thread" page are always kept."""
+        remaining = []
+        for more_comments in frontier:
+            if more_comments.count == 0:
+                remaining.append(more_comments)
+                continue
+            children = [
+                child for child in more_comments.children if child not in skip_ids
+            ]
+            if children:
+                more_comments.children = children
+                more_comments.count = len(children)
+                remaining.append(more_comments)
+        return remaining
+
+    def save_frontier(self, frontier: list[MoreComments]) -> None:
+        """Save the unresolved ``MoreComments``, if checkpoints are in use."""
+        if self._checkpoint:
+            self._checkpoint.save_frontier(
+                [self.more_comments_data(item) for item in frontier]
+            )
+
+    @staticmethod
+    def more_comments_data(more_comments: MoreComments) -> dict:
+        """Return the data needed to recreate a ``MoreComments`` object."""
+        return {
+            "id": more_comments.id,
+            "name": more_comments.name,
+            "parent_id": more_comments.parent_id,
+            "depth": more_comments.depth,
+            "count": more_comments.count,
+            "children": more_comments.children,
+        }
+
+    def load_more_comments(self, data: dict) -> MoreComments:
+        """Recreate a ``MoreComments`` object of the current submission."""
+        more_comments = MoreComments(self._reddit, data)
+        more_comments.submission = self._submission
+        return more_comments
+
+    @staticmethod
+    def comment_record(comment: Comment) -> dict:
+        """Return the raw data of a comment, without PRAW internals."""
+        record = {
+            key: value
+            for key, value in vars(comment).items()
+            if not key.startswith("_")
+        }
+        record["author"] = comment.author.name if comment.author else None
+        record["subreddit"] = str(comment.subreddit)
+        return record
+
+    @staticmethod
+    def submission_record(submission: Submission) -> dict:
+        """Return the raw data of a submission, without PRAW internals."""
+        record = {
+            key: value
+            for key, value in vars(submission).items()
+            if not key.startswith("_") and key not in {"comment_limit", "comment_sort"}
+        }
+        record["author"] = submission.author.name if submission.author else None
+        record["subreddit"] = str(submission.subreddit)
+        return record
+
+    @staticmethod
+    def is_deleted(record: dict) -> bool:
+        """Return whether the raw data is of a deleted or removed submission."""
+        return bool(record.get("removed_by_category")) or (
+            record["author"] is None and record.get("selftext") in DELETED_TEXTS
+        )
 
     @property
-    def all_comments(self) -> list[Comment]:
-        """Return all comments of the submission."""
-        comments = self._submission.comments
-        return comments.list()
+    def all_comments(self) -> Iterator[dict]:
+        """Yield the raw data of all comments of the submission, in thread order."""
+        for comment_id, *_ in walk_tree(self._comments.parents):
+            yield self._comments[comment_id]
+
+    @staticmethod
+    def archive_path(path: str, submission_id: str) -> pathlib.PurePath:
+        """Return the path of the archive of the given submission."""
+        return pathlib.Path(f"{path}\\dump\\{submission_id}{ARCHIVE_EXTENSION}")
+
+    def archive_source(
+        self, path: str, submission_id: str
+    ) -> pathlib.PurePath | BinaryIO:
+        """Return the archive of the given submission, as a file or a pack record.
+
+        An archive file is the most recent one, as packing an archive
+        removes its file."""
+        file_path = self.archive_path(path, submission_id)
+        if file_path.is_file():
+            return file_path
+        pack = self.pack(f"{path}\\dump{PACK_EXTENSION}")
+        if submission_id in pack:
+            return io.BytesIO(pack[submission_id])
+        return file_path
 
     @property
     def id(self) -> str:
         """Return the submission id."""
-        if self._submission:
-            return self._submission.id
+        if self._submission_data:
+            return self._submission_data["id"]
         return None
 
-    def extract_comments(self) -> dict[str, dict]:
+    def extract_comments(self) -> CommentStore:
         """Return all the comment data."""
-        return {comment.id: vars(comment) for comment in self.all_comments}
+        return self._comments
 
     def extract_submission(self) -> dict:
         """Return all the submission information."""
-        return vars(self._submission)
+        return self._submission_data
 
     @staticmethod
-    def submission_to_json(submission: Submission) -> dict:
+    def submission_to_json(submission: dict) -> dict:
         """Return a selection of submission attributes that are JSON-ifiable."""
         info = {
-            "id": submission.id,
-            "author": submission.author.name if submission.author else None,
-            "title": submission.title,
-            "body": submission.selftext,
-            "created": submission.created,
-            "created_utc": submission.created_utc,
-            "edited": submission.edited,
-            "num_comments": submission.num_comments,
-            "score": submission.score,
-            "upvotes": submission.ups,
-            "upvote_ratio": submission.upvote_ratio,
-            "gilded": submission.gilded,
-            "archived": submission.archived,
+            "id": submission["id"],
+            "author": submission["author"],
+            "title": submission["title"],
+            "body": submission["selftext"],
+            "created": submission["created"],
+            "created_utc": submission["created_utc"],
+            "edited": submission["edited"],
+            "num_comments": submission["num_comments"],
+            "score": submission["score"],
+            "upvotes": submission["ups"],
+            "upvote_ratio": submission["upvote_ratio"],
+            "gilded": submission["gilded"],
+            "archived": submission["archived"],
         }
         return info
 
     @staticmethod
-    def comment_to_json(comment: Comment) -> dict:
+    def comment_to_json(comment: dict) -> dict:
         """Return a selection of comment attributes that are JSON-ifiable."""
         info = {
-            "id": comment.id,
-            "author": comment.author.name if comment.author else None,
-            "body": comment.body,
-            "created": comment.created,
-            "created_utc": comment.created_utc,
-            "edited": comment.edited,
-            "upvotes": comment.ups,
-            "downvotes": comment.downs,
-            "depth": comment.depth,
-            "gilded": comment.gilded,
-            "parent": comment.parent_id,
+            "id": comment["id"],
+            "author": comment["author"],
+            "body": comment["body"],
+            "created": comment["created"],
+            "created_utc": comment["created_utc"],
+            "edited": comment["edited"],
+            "upvotes": comment["ups"],
+            "downvotes": comment["downs"],
+            "depth": comment["depth"],
+            "gilded": comment["gilded"],
+            "parent": comment["parent_id"],
         }
         return info
 
     def comments_to_json(self) -> dict:
         """Return a JSON-ified version of all comments."""
         return {
-            comment.id: self.comment_to_json(comment) for comment in self.all_comments
+            comment["id"]: self.comment_to_json(comment)
+            for comment in self.all_comments
         }
 
-    def dump_all(self, path: str) -> None:
-        """Dump everything from the current submission."""
-        comments_json = self.comments_to_json()
-        self.dump_pickle(path=path)
-        self.dump_json(
-            obj=[self.submission_to_json(self._submission), comments_json], path=path
-        )
-        self.dump_to_db(comments_json)
+    def dump_all(
+        self,
+        path: str,
+        json_lines: bool = False,
+        archive: bool = True,
+        packed: bool = False,
+    ) -> None:
+        """Dump everything from the current submission.
 
-    def dump_pickle(self, path: str) -> None:
-        """Pickle all information.
+        In JSON Lines mode, the JSON-ified comments are written one at a time
+        instead of being collected in a single object,
+        so comments kept on disk are never all loaded in memory.
+        In packed mode, they are written in JSON Lines format
+        to the pack of the dumps, and the archive to the pack of the archives,
+        instead of files of their own.
+        Only comments that were not archived before are added to the db."""
+        if archive:
+            self.dump_archive(path=path, packed=packed)
+        if packed:
+            self.dump_pack(path=path)
+        elif json_lines:
+            self.dump_json_lines(path=path)
+        else:
+            self.dump_json(
+                obj=[
+                    self.submission_to_json(self.extract_submission()),
+                    self.comments_to_json(),
+                ],
+                path=path,
+            )
+        self.dump_to_db()
+        if self._checkpoint:
+            self._checkpoint.clear()
 
-        The file is named after the submission id."""
-        file_path: pathlib.PurePath = pathlib.Path(f"{path}\\dump\\{self.id}.pickle")
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        with file_path.open("wb") as f:
-            print(f"Pickling submission {self.id}")
-            pickle.dump([self.extract_submission(), self.extract_comments()], f)
+    def dump_archive(self, path: str, packed: bool = False) -> None:
+        """Save the raw data of the submission and its comments in a compressed archive.
+
+        The file is named after the submission id.
+        In packed mode, the archive is a record of the pack of the archives instead,
+        which replaces its file. Past the memory limit, if any, the record
+        is written to a temporary file before being copied to the pack."""
+        file_path = self.archive_path(path, self.id)
+        print(f"Archiving submission {self.id}")
+        if packed:
+            pack = self.pack(f"{path}\\dump{PACK_EXTENSION}")
+            with tempfile.SpooledTemporaryFile(max_size=self._memory_limit or 0) as f:
+                self.write_archive(f)
+                pack.put(self.id, f)
+            file_path.unlink(missing_ok=True)
+        else:
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            self.write_archive(file_path)
+
+    def write_archive(self, file: pathlib.PurePath | BinaryIO) -> None:
+        """Write the archive of the submission and its comments to a path or file."""
+        with ArchiveWriter(file) as archive:
+            archive.write_submission(self.extract_submission())
+            for comment in self.all_comments:
+                archive.write_comment(comment)
 
     def dump_json(self, obj: Any, path: str) -> None:
         """Dump the information in JSON format.
 
         The file is named after the submission id."""
-        file_path: pathlib.PurePath = pathlib.Path(f"{path}\\json\\{self.id}.json")
+        file_path = self.dump_path(path, ".json")
         file_path.parent.mkdir(parents=True, exist_ok=True)
-        with file_path.open("w", encoding="utf8") as f:
+        with open_writer(file_path, self._compression, self.dictionary(path)) as f:
             print(f"Saving submission {self.id}")
             f.write(json.dumps(obj))
+        self.remove_dumps(path, keep=file_path)
+
+    def dump_json_lines(self, path: str) -> None:
+        """Dump the information in JSON Lines format.
 
-    def dump_to_db(self, comments_data: dict) -> None:
-        """Save comment tree into db."""
+        The first line is the submission, followed by one line per comment.
+        The file is named after the submission id."""
+        file_path = self.dump_path(path, ".jsonl")
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open_writer(file_path, self._compression, self.dictionary(path)) as f:
+            print(f"Saving submission {self.id}")
+            f.writelines(self.json_lines())
+        self.remove_dumps(path, keep=file_path)
+
+    def dump_pack(self, path: str) -> None:
+        """Dump the information in JSON Lines format, in the pack of the dumps.
+
+        The record is named after the submission id, and replaces its dump files.
+        Past the memory limit, if any, the record is written to a temporary file
+        before being copied to the pack."""
+        pack = self.pack(f"{path}\\json{PACK_EXTENSION}")
+        with tempfile.SpooledTemporaryFile(max_size=self._memory_limit or 0) as f:
+            print(f"Saving submission {self.id}")
+            with compressed_writer(
+                f, self._compression, self.dictionary(path)
+            ) as writer:
+                for line in self.json_lines():
+                    writer.write(line.encode("utf8"))
+            pack.put(self.id, f)
+        self.remove_dumps(path)
+
+    def dump_path(self, path: str, extension: str) -> pathlib.PurePath:
+        """Return the path of the dump file of the submission with the extension.
+
+        The extension of the compression, if any, is added to it."""
+        compressed = EXTENSIONS.get(self._compression, "")
+        return pathlib.Path(f"{path}\\json\\{self.id}{extension}{compressed}")
+
+    def remove_dumps(self, path: str, keep: pathlib.PurePath = None) -> None:
+        """Remove the dump files of the submission, other than the given one."""
+        for extension in (".json", ".jsonl"):
+            for compressed in ("", *EXTENSIONS.values()):
+                file_path = pathlib.Path(
+                    f"{path}\\json\\{self.id}{extension}{compressed}"
+                )
+                if file_path != keep:
+                    file_path.unlink(missing_ok=True)
+
+    def dictionary(self, path: str) -> bytes:
+        """Return the zstd dictionary of the dumps in the given path, if used."""
+        if self._compression != ZSTD:
+            return None
+        return load_dictionary(f"{path}\\json{DICTIONARY_EXTENSION}")
+
+    def json_lines(self) -> Iterator[str]:
+        """Yield the JSON-ified submission, then each comment, one per line."""
+        yield f"{json.dumps(self.submission_to_json(self.extract_submission()))}\n"
+        for comment in self.all_comments:
+            yield f"{json.dumps(self.comment_to_json(comment))}\n"
+
+    def pack(self, file_path: str) -> PackStore:
+        """Return the pack at the given path, kept open for the next dumps."""
+        if file_path not in self._packs:
+            self._packs[file_path] = PackStore(file_path)
+        return self._packs[file_path]
+
+    def dump_to_db(self) -> None:
+        """Save comment tree into db.
+
+        Only comments that were not archived before are added."""
+        parents = self._comments.parents
+        paths = self.comment_paths(parents)
         relations = (
             (
                 self.id,
                 comment_id,
-                comment["parent"][3:] if comment["parent"].startswith("t1_") else None,
+                parent[3:] if parent.startswith("t1_") else None,
+                *paths[comment_id],
             )
-            for comment_id, comment in comments_data.items()
+            for comment_id, parent in parents.items()
+            if comment_id not in self._archived_ids
         )
         self._db.q.executemany(ADD_COMMENT_TREE_RELATIONS, relations)
+
+    @staticmethod
+    def comment_paths(parents: dict[str, str]) -> dict[str, tuple[str, int, int]]:
+        """Return the materialised path, depth, and sibling order of each comment."""
+        return {
+            comment_id: (path, depth, order)
+            for comment_id, path, depth, order in walk_tree(parents)
+        }
@@ -0,0 +1,216 @@
+"""Registry of the layouts used by the wiki pages, detected from their structure.
+
+Each table format declares a cheap structural signature: the number of
+header columns, a pattern for the header row, and which cells of the first
+rows have links. A table is parsed with the first registered format matching
+its signature, unless the formats file overrides it for its page or entry.
+Signatures only hold structural fields, which header patterns match instead
+of the header itself, so detections are cached per page and tables
+of the same shape are matched once.
+
+Entry delimiters of the pages are overridden in the formats file the same way,
+and otherwise detected as the candidate starting the most lines."""
+
+import re
+import json
+import collections
+from dataclasses import dataclass
+from typing import Callable
+from parser_wiki import read_lines
+
+FORMATS_PATH = "src\\wiki_formats.json"
+
+# Rows of a table whose layout is part of its signature
+SIGNATURE_ROWS = 3
+
+
+@dataclass(frozen=True)
+class Signature:
+    """The structure of the first rows of a table.
+
+    ``headers`` has the header patterns matching the first row,
+    ``links`` the positions of the cells with links in each row,
+    and ``cells`` the number of cells, empty cells not being counted."""
+
+    headers: frozenset[str]
+    links: tuple[tuple[int, ...], ...]
+    cells: tuple[int, ...]
+
+    @classmethod
+    def of(cls, table: list[str], headers: tuple[str, ...] = ()) -> "Signature":
+        """Return the signature of a table, given the header patterns to check.
+
+        A cell has a link if it has the "](" of one, which is enough
+        to tell layouts apart without finding the links themselves."""
+        rows = [list(filter(None, row.split("|"))) for row in table[:SIGNATURE_ROWS]]
+        header = table[0] if table else ""
+        return cls(
+            headers=frozenset(
+                pattern for pattern in headers if re.match(pattern, header)
+            ),
+            links=tuple(
+                tuple(n for n, cell in enumerate(row) if "](" in cell) for row in rows
+            ),
+            cells=tuple(len(row) for row in rows),
+        )
+
+
+def layout_matches(layout: str, positions: tuple[int, ...], cells: int) -> bool:
+    """Return whether the cells with links of a row follow the given layout.
+
+    Layouts are "none", "some", or which cells have links: "all", "first",
+    "last", or "odd" for alternating name/link cells.
+    The last three need more than one cell to tell them apart."""
+    if layout == "none":
+        return not positions
+    if layout == "some":
+        return bool(positions)
+    if layout == "all":
+        return positions == tuple(range(cells))
+    if cells < 2:
+        return False
+    if layout == "first":
+        return positions == (0,)
+    if layout == "last":
+        return positions == (cells - 1,)
+    if layout == "odd":
+        return positions == tuple(range(1, cells, 2))
+    raise ValueError(f"Unknown row layout: {layout}")
+
+
+@dataclass(frozen=True)
+class TableFormat:
+    """A table format, and the signature of the tables using it.
+
+    ``rows`` has the layout of the links of each of the first rows,
+    the header included; rows missing from a table match any layout.
+    Formats that are not ``detected`` are only used through overrides."""
+
+    name: str
+    parse: Callable[[list[str]], dict]
+    columns: int = None
+    header: str = None
+    rows: tuple[str, ...] = ()
+    detected: bool = True
+
+    def matches(self, signature: Signature) -> bool:
+        """Return whether a table with the given signature uses this format."""
+        if self.columns is not None and signature.cells[:1] != (self.columns,):
+            return False
+        if self.header is not None and self.header not in signature.headers:
+            return False
+        return all(
+            layout_matches(layout, positions, cells)
+            for layout, positions, cells in zip(
+                self.rows, signature.links, signature.cells
+            )
+        )
+
+
+def load_overrides(collection: str, path: str = FORMATS_PATH) -> dict:
+    """Return the manual overrides of the given collection of pages, if any."""
+    try:
+        with open(path, encoding="utf8") as f:
+            return json.load(f).get(collection, {})
+    except FileNotFoundError:
+        return {}
+
+
+def detect_delimiter(file_path: str, candidates: tuple[str, ...]) -> str:
+    """Return the candidate delimiter starting the most lines of a file, if any."""
+    counts = collections.Counter()
+    for line in read_lines(file_path):
+        for candidate in candidates:
+            if line.startswith(candidate):
+                counts[candidate] += 1
+                break
+    return counts.most_common(1)[0][0] if counts else None
+
+
+class FormatRegistry:
+    """The table formats of a collection of wiki pages, in detection order."""
+
+    def __init__(
+        self,
+        collection: str,
+        formats: list[TableFormat],
+        delimiters: tuple[str, ...] = (),
+        path: str = FORMATS_PATH,
+    ) -> None:
+        """Initialise the registry, with the overrides from the formats file."""
+        self._formats = {table_format.name: table_format for table_format in formats}
+        self.headers = tuple(
+            {
+                table_format.header: None
+                for table_format in formats
+                if table_format.header is not None
+            }
+        )
+        self._delimiters = delimiters
+        self._collection = collection
+        self._path = path
+        self._overrides = None
+
+    @property
+    def overrides(self) -> dict:
+        """Return the manual overrides, loaded on first use."""
+        if self._overrides is None:
+            self._overrides = load_overrides(self._collection, self._path)
+        return self._overrides
+
+    def __getitem__(self, name: str) -> TableFormat:
+        return self._formats[name]
+
+    def page(self, page: str) -> "PageFormats":
+        """Return the formats of the given page."""
+        return PageFormats(self, page)
+
+    def detect(self, signature: Signature) -> TableFormat:
+        """Return the first detected format matching the signature."""
+        for table_format in self._formats.values():
+            if table_format.detected and table_format.matches(signature):
+                return table_format
+        raise ValueError("Invalid table format.")
+
+    def delimiter(self, page: str, file_path: str) -> str:
+        """Return the entry delimiter of a page, overridden or detected."""
+        if (delimiter := self.overrides.get("delimiters", {}).get(page)) is not None:
+            return delimiter
+        return detect_delimiter(file_path, self._delimiters)
+
+
+class PageFormats:
+    """The table formats of a wiki page, with the detections cached."""
+
+    def __init__(self, registry: FormatRegistry, page: str) -> None:
+        self._registry = registry
+        self._page = page
+        self._overrides = registry.overrides.get("tables", {}).get(page, {})
+        self._cache: dict[Signature, TableFormat] = {}
+
+    @property
+    def overrides(self) -> dict:
+        """Return the manual overrides of the page, by kind (tables, delimiters)."""
+        return {
+            kind: overrides[self._page]
+            for kind, overrides in self._registry.overrides.items()
+            if self._page in overrides
+        }
+
+    def table_format(self, table: list[str], entry: str = None) -> TableFormat:
+        """Return the format of a table of the page, in the given entry.
+
+        The override of the entry comes first, then the one of the page,
+        given as a format name instead of a mapping of the entries."""
+        if isinstance(self._overrides, str):
+            return self._registry[self._overrides]
+        if entry in self._overrides:
+            return self._registry[self._overrides[entry]]
+        signature = Signature.of(table, self._registry.headers)
+        if signature not in self._cache:
+            self._cache[signature] = self._registry.detect(signature)
+        return self._cache[signature]
+
+    def parse(self, table: list[str], entry: str = None) -> dict:
+        """Parse a table of the page, in the given entry."""
+        return self.table_format(table, entry).parse(table)
@@ -0,0 +1,47 @@
+"""Find the links of markdown table rows, and what they point to, in a single pass."""
+
+import re
+
+# Links cannot span cells, their url ends at the first ")" or at the end of the cell
+LINK = re.compile(r"\[([^\[\]|]*)\]\(([^)|]*)\)?")
+# The patterns below find the same links as LINK, with optional groups
+# for what they point to, so that each row is scanned once
+URL_END = r"[^)|]*\)?"
+# Links relative to the subreddit, as in /id, with the leading /comments/ dropped
+RELATIVE_LINK = re.compile(
+    r"\[([^\[\]|]*)\]\((?:\/(?:comments\/(?=[^)|]))?([^)|]+))?" + URL_END
+)
+# Links to the comments of a post, or with the post id as last part of the path
+POST_LINK = re.compile(
+    r"\[([^\[\]|]*)\]\((?:[^\s)|]*comments\/(\w+)|[^)|]*\/(\w+))?" + URL_END
+)
+# A non empty cell without links, and a cell starting with a redd.it short link
+TEXT_CELL = r"(?:^|\|)((?=[^|])[^\[|]*(?:\[(?![^\[\]|]*\]\()[^\[|]*)*)\|"
+SHORT_LINK = r"\[[^\]|]*\]\(https?:\/\/redd\.it\/(\w+)(?=[)|]|$)"
+# Short links titled by the previous cell
+TITLED_LINK = re.compile(TEXT_CELL + "(?=" + SHORT_LINK + ")")
+# Titled short links, then links to the comments of a post, short links,
+# or links relative to the subreddit, as in /id
+PERMALINK = re.compile(
+    TEXT_CELL
+    + SHORT_LINK
+    + URL_END
+    + r"|\[([^\[\]|]*)\]\((?:[^\s)|]*comments\/(\w+)"
+    + r"|https?:\/\/redd\.it\/(\w+)(?=[)|]|$)|\/(\w+)(?=[)|]|$))?"
+    + URL_END
+)
+
+
+def relative_links(text: str) -> list[tuple[str, str]]:
+    """Return the text and target of the links relative to the subreddit.
+
+    Targets are as in ``/id``, with a leading ``/comments/`` dropped."""
+    return [(text, target) for text, target in RELATIVE_LINK.findall(text) if target]
+
+
+def first_target(text: str) -> str:
+    """Return the target of the first link relative to the subreddit, or None."""
+    for _, target in RELATIVE_LINK.findall(text):
+        if target:
+            return target
+    return None
@@ -1,19 +1,44 @@
 """Scrape wiki contents of a subreddit"""
 
+import os
+import json
 import pathlib
+import logging
+import threading
+import concurrent.futures
 import praw
+import prawcore
 from praw.models.reddit import subreddit
 
+MANIFEST = "manifest.json"
+# Pages downloaded at the same time when syncing
+WORKERS = 4
+
+logger = logging.getLogger(__name__)
+
+
+def write_atomic(file_path: pathlib.Path, text: str) -> None:
+    """Write a file through a temporary file, so that it is never left partial."""
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = file_path.with_name(f"{file_path.name}.tmp")
+    with temp_path.open("w", encoding="utf8") as f:
+        f.write(text)
+    os.replace(temp_path, file_path)
+
 
 class WikiScraper:
     """The scraper."""
 
-    def __init__(self, config_name: str) -> None:
+    def __init__(self, config_name: str, **settings) -> None:
         """Initialise a Reddit instance for the given bot name.
 
-        The configuration must be in a .ini file in the workspace folder."""
-        self._reddit: praw.Reddit = praw.Reddit(config_name)
+        The configuration must be in a .ini file in the workspace folder.
+        Extra settings override the ones in the configuration."""
+        self._config_name = config_name
+        self._settings = settings
+        self._reddit: praw.Reddit = praw.Reddit(config_name, **settings)
         self._subreddit: subreddit.Subreddit = None
+        self._local = threading.local()
 
     def select_subreddit(self, name: str) -> None:
         """Pick the subreddit to scrape."""
@@ -22,14 +47,131 @@ class WikiScraper:
     def download_wiki_contents(self, path: str = "data\\wiki") -> None:
         """Download all wiki contents of the given subreddit into local files."""
         for wiki_page in self._subreddit.wiki:
-            file_path: pathlib.PurePath = pathlib.Path(f"{path}\\{wiki_page}.md")
-            file_path.parent.mkdir(parents=True, exist_ok=True)
-            with file_path.open("w", encoding="utf8") as f:
-                print(f"Downloading: {wiki_page}")
-                f.write(wiki_page.content_md)
+            print(f"Downloading: {wiki_page}")
+            write_atomic(pathlib.Path(f"{path}\\{wiki_page}.md"), wiki_page.content_md)
+
+    def sync_wiki_contents(
+        self, path: str = "data\\wiki", workers: int = WORKERS
+    ) -> list[str]:
+        """Download the wiki pages changed since the last sync, and return them.
+
+        The revision of each page downloaded is kept in a manifest in the path,
+        along with the latest wiki revision seen. Revisions made since then
+        tell which pages changed, and only those, new pages, and pages missing
+        locally are downloaded, in parallel. Without access to the revisions,
+        all pages are downloaded but only the ones with a new revision
+        or missing locally are written."""
+        manifest_path = pathlib.Path(f"{path}\\{MANIFEST}")
+        manifest = {"pages": {}, "last_revision": None}
+        if manifest_path.is_file():
+            with manifest_path.open(encoding="utf8") as f:
+                manifest = json.load(f)
+        # Pages are named after their subreddit, as their files
+        pages = {str(wiki_page): wiki_page.name for wiki_page in self._subreddit.wiki}
+        for name in set(manifest["pages"]) - set(pages):
+            logger.info("Page %s no longer in the wiki", name)
+            del manifest["pages"][name]
+        try:
+            changed, last_revision = self.changed_pages(manifest["last_revision"])
+        except prawcore.exceptions.Forbidden:
+            logger.warning("Wiki revisions not available, checking every page")
+            changed, last_revision = set(pages), None
+        if manifest["last_revision"] is None:
+            changed = set(pages)
+        missing = {
+            name for name in pages if not pathlib.Path(f"{path}\\{name}.md").is_file()
+        }
+        to_download = [
+            name
+            for name in pages
+            if name in changed or name not in manifest["pages"] or name in missing
+        ]
+        print(f"{len(to_download)}/{len(pages)} pages to download")
+        updated = []
+        failed = False
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    self.download_page,
+                    pages[name],
+                    path,
+                    None if name in missing else manifest["pages"].get(name),
+                ): name
+                for name in to_download
+            }
+            for future in concurrent.futures.as_completed(futures):
+                name = futures[future]
+                try:
+                    revision = future.result()
+                except Exception as e:
+                    print(f"Exception: {e}")
+                    logger.error(
+                        "An exception has occurred while syncing %s: %s", name, e
+                    )
+                    failed = True
+                    continue
+                if revision != manifest["pages"].get(name) or name in missing:
+                    manifest["pages"][name] = revision
+                    updated.append(name)
+        # Pages that failed are found changed again next time
+        if last_revision is not None and not failed:
+            manifest["last_revision"] = last_revision
+        write_atomic(manifest_path, json.dumps(manifest, indent=2, sort_keys=True))
+        logger.info("%s pages updated", len(updated))
+        return sorted(updated)
+
+    def changed_pages(self, since: dict = None) -> tuple[set[str], dict]:
+        """Return the pages revised after the given revision, and the latest one.
+
+        Revisions are listed from the most recent, until the given one is reached.
+        Without a revision to start from, only the latest one is read."""
+        changed = set()
+        last_revision = None
+        for revision in self._subreddit.wiki.revisions(limit=None):
+            if last_revision is None:
+                last_revision = {
+                    "id": revision["id"],
+                    "timestamp": revision["timestamp"],
+                }
+            if since is None:
+                break
+            if (
+                revision["id"] == since["id"]
+                or revision["timestamp"] < since["timestamp"]
+            ):
+                break
+            changed.add(str(revision["page"]))
+        return changed, last_revision or since
+
+    def thread_reddit(self) -> praw.Reddit:
+        """Return the Reddit instance of the current thread.
+
+        PRAW is not thread safe, so each download thread has its own."""
+        if not hasattr(self._local, "reddit"):
+            self._local.reddit = praw.Reddit(self._config_name, **self._settings)
+        return self._local.reddit
+
+    def download_page(self, name: str, path: str, known: dict = None) -> dict:
+        """Download a wiki page of the subreddit into a local file.
+
+        Return the revision of the page.
+
+        The file is only written if the revision differs from the known one."""
+        wiki_page = (
+            self.thread_reddit().subreddit(self._subreddit.display_name).wiki[name]
+        )
+        name = str(wiki_page)
+        revision = {
+            "id": wiki_page.revision_id,
+            "timestamp": wiki_page.revision_date,
+        }
+        if revision != known:
+            print(f"Downloading: {name}")
+            write_atomic(pathlib.Path(f"{path}\\{name}.md"), wiki_page.content_md)
+        return revision
 
 
 if __name__ == "__main__":
     scraper = WikiScraper("CommentTreeScraper")
     scraper.select_subreddit("anime")
-    scraper.download_wiki_contents()
+    scraper.sync_wiki_contents()